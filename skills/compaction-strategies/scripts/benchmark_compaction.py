@@ -0,0 +1,279 @@
+"""Benchmark the compaction hooks on synthetic histories.
+
+Each strategy is called directly on a ``HookContext`` set up the way the
+agent-card-hooks smoke test sets one up (an ``LlmAgent`` holding a generated
+``PromptMessageExtended`` history, with its ``HookSmokeRunner`` as the runner),
+and a stub compactor agent stands in for the LLM. Reports hook latency (first
+call and the next turn), peak traced memory, and estimated tokens removed, as JSON.
+
+Run from this directory so ``compaction_hooks`` is importable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import sys
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from types import ModuleType
+
+from mcp.types import CallToolRequest, CallToolRequestParams, CallToolResult, TextContent
+
+from fast_agent.agents.agent_types import AgentConfig
+from fast_agent.agents.llm_agent import LlmAgent
+from fast_agent.hooks.hook_context import HookContext
+from fast_agent.types import LlmStopReason, PromptMessageExtended
+
+import compaction_hooks
+
+_DEFAULT_SMOKE_TEST = (
+    Path(__file__).resolve().parents[2] / "agent-card-hooks" / "scripts" / "hook_smoke_test.py"
+)
+
+Hook = Callable[[HookContext], Awaitable[None]]
+
+
+class StubCompactor:
+    """Stands in for a compactor agent; returns a fixed-size summary."""
+
+    name = "compactor"
+
+    def __init__(self, summary_chars: int = 800) -> None:
+        self.summary = "summary " * (summary_chars // 8)
+        self.input_chars = 0
+
+    async def send(self, message: str) -> str:
+        self.input_chars += len(message)
+        return self.summary
+
+
+def _strategies() -> dict[str, Hook]:
+    hooks = compaction_hooks
+    return {
+        "rolling_window": hooks.rolling_window,
+        "truncate_over_threshold": hooks.truncate_over_threshold,
+        "cache_aware_window": hooks.cache_aware_window,
+        "clear_results_soft": hooks.clear_results_soft,
+        "clear_results_hard": hooks.clear_results_hard,
+        "evict_tool_results": hooks.evict_tool_results,
+        "dedupe_tool_results": hooks.dedupe_tool_results,
+        "compaction_prompt": lambda ctx: hooks.compaction_prompt(
+            ctx, compactor_agent=StubCompactor.name
+        ),
+    }
+
+
+def _load_smoke_test(path: Path) -> ModuleType:
+    spec = importlib.util.spec_from_file_location("hook_smoke_test", path)
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"Cannot load smoke test runner from {path}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _text(role: str, text: str, **kwargs: object) -> PromptMessageExtended:
+    return PromptMessageExtended(
+        role=role,
+        content=[TextContent(type="text", text=text)],
+        **kwargs,
+    )
+
+
+def _synthetic_turn(
+    index: int,
+    result_chars: int,
+    repeat_every: int,
+) -> list[PromptMessageExtended]:
+    """One user turn: question, tool call, tool result, final answer."""
+    tool_id = f"call_{index}"
+    # Every ``repeat_every``-th call re-reads an earlier file with an identical payload.
+    source = index - 1 if repeat_every and index % repeat_every == 0 and index else index
+    payload = (f"line {source}: " + "x" * 60 + "\n") * max(1, result_chars // 70)
+    return [
+        _text("user", f"Question {index}: look at module_{source}.py and explain it."),
+        _text(
+            "assistant",
+            "Reading the file.",
+            tool_calls={
+                tool_id: CallToolRequest(
+                    method="tools/call",
+                    params=CallToolRequestParams(
+                        name="read_file", arguments={"path": f"src/module_{source}.py"}
+                    ),
+                )
+            },
+            stop_reason=LlmStopReason.TOOL_USE,
+        ),
+        PromptMessageExtended(
+            role="user",
+            content=[],
+            tool_results={
+                tool_id: CallToolResult(content=[TextContent(type="text", text=payload)])
+            },
+        ),
+        _text(
+            "assistant",
+            f"module_{source}.py defines a helper. " * 8,
+            stop_reason=LlmStopReason.END_TURN,
+        ),
+    ]
+
+
+def _synthetic_history(
+    messages: int,
+    result_chars: int,
+    repeat_every: int,
+) -> list[PromptMessageExtended]:
+    history: list[PromptMessageExtended] = []
+    index = 0
+    while len(history) < messages:
+        history.extend(_synthetic_turn(index, result_chars, repeat_every))
+        index += 1
+    return history
+
+
+def _context(
+    smoke_test: ModuleType,
+    history: list[PromptMessageExtended],
+) -> tuple[HookContext, LlmAgent]:
+    agent = LlmAgent(AgentConfig(name="compaction-benchmark"))
+    agent.load_message_history(history)
+    agent.set_agent_registry({agent.name: agent, StubCompactor.name: StubCompactor()})
+    runner = smoke_test.HookSmokeRunner(delta_messages=list(history))
+    ctx = HookContext(
+        runner=runner,
+        agent=agent,
+        message=history[-1],
+        hook_type="after_turn_complete",
+    )
+    return ctx, agent
+
+
+def _reset_token_cache() -> None:
+    """Start the next hook call with an empty token-count cache, as a fresh process would."""
+    compaction_hooks.configure_tokenizer(compaction_hooks._get_token_counter().tokenizer)
+
+
+async def _measure(
+    smoke_test: ModuleType,
+    name: str,
+    hook: Hook,
+    history: list[PromptMessageExtended],
+    *,
+    result_chars: int,
+    repeat_every: int,
+) -> dict[str, object]:
+    ctx, agent = _context(smoke_test, list(history))
+    tokens_before = compaction_hooks._estimate_tokens(agent.message_history)
+
+    # Counting tokens_before (and earlier strategies) warmed the process-wide cache.
+    _reset_token_cache()
+    start = time.perf_counter()
+    await hook(ctx)
+    first_call_ms = (time.perf_counter() - start) * 1000
+    messages_after = len(agent.message_history)
+    tokens_after = compaction_hooks._estimate_tokens(agent.message_history)
+
+    # Steady state: one more turn, as the hook would see it on the next completion.
+    next_turn = _synthetic_turn(len(history), result_chars, repeat_every)
+    agent.append_history(next_turn)
+    ctx.message = agent.message_history[-1]
+    start = time.perf_counter()
+    await hook(ctx)
+    next_turn_ms = (time.perf_counter() - start) * 1000
+
+    memory_ctx, _ = _context(smoke_test, list(history))
+    _reset_token_cache()
+    tracemalloc.start()
+    try:
+        await hook(memory_ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "strategy": name,
+        "messages": len(history),
+        "result_chars": result_chars,
+        "first_call_ms": round(first_call_ms, 3),
+        "next_turn_ms": round(next_turn_ms, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "messages_after": messages_after,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_removed": tokens_before - tokens_after,
+    }
+
+
+async def _run(args: argparse.Namespace) -> list[dict[str, object]]:
+    smoke_test = _load_smoke_test(Path(args.smoke_test).expanduser())
+    strategies = _strategies()
+    selected = args.strategy or list(strategies)
+    results: list[dict[str, object]] = []
+    for size in args.sizes:
+        history = _synthetic_history(size, args.result_chars, args.repeat_every)
+        for name in selected:
+            result = await _measure(
+                smoke_test,
+                name,
+                strategies[name],
+                history,
+                result_chars=args.result_chars,
+                repeat_every=args.repeat_every,
+            )
+            print(
+                f"{name:<24} {result['messages']:>6} msgs  "
+                f"{result['first_call_ms']:>9.2f} ms  next {result['next_turn_ms']:>8.2f} ms  "
+                f"peak {result['peak_kib']:>9.1f} KiB  -{result['tokens_removed']} tokens"
+            )
+            results.append(result)
+    return results
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(part) for part in value.split(",")],
+        default=[100, 1000, 5000, 20000],
+        help="Comma-separated history sizes in messages (default: 100,1000,5000,20000)",
+    )
+    parser.add_argument("--result-chars", type=int, default=2000, help="Tool result size")
+    parser.add_argument(
+        "--repeat-every",
+        type=int,
+        default=5,
+        help="Repeat an earlier tool payload every N calls (0 disables)",
+    )
+    parser.add_argument(
+        "--strategy",
+        action="append",
+        choices=sorted(_strategies()),
+        help="Strategy to run (repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--smoke-test",
+        default=str(_DEFAULT_SMOKE_TEST),
+        help="Path to agent-card-hooks/scripts/hook_smoke_test.py",
+    )
+    parser.add_argument("--output", default="compaction-benchmark.json", help="JSON results path")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    results = asyncio.run(_run(args))
+    output = Path(args.output).expanduser()
+    output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
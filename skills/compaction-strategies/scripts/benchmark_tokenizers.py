@@ -0,0 +1,159 @@
+"""Compare compaction token estimators on recorded histories.
+
+For every history file, each estimator counts the messages turn by turn (the way
+the compaction hooks see them) and is scored against provider-reported input
+tokens from the ``fast-agent-usage`` channel when present (these include the
+system prompt and tool schemas, so expect a negative bias), or against the BPE
+tokenizer otherwise.
+
+Run from this directory so ``compaction_hooks`` is importable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fast_agent.constants import FAST_AGENT_USAGE
+from fast_agent.mcp.helpers.content_helpers import get_text
+from fast_agent.mcp.prompt_serialization import load_messages
+from fast_agent.types import PromptMessageExtended, split_into_turns
+
+from compaction_hooks import (
+    BPE_VOCAB_ENV,
+    BpeTokenizer,
+    HeuristicTokenizer,
+    TokenCounter,
+    Tokenizer,
+)
+
+
+@dataclass(slots=True)
+class EstimatorResult:
+    name: str
+    samples: int = 0
+    abs_error_pct: float = 0.0
+    bias_pct: float = 0.0
+    turns: int = 0
+    seconds: float = 0.0
+    errors: list[float] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            "estimator": self.name,
+            "samples": self.samples,
+            "mean_abs_error_pct": round(self.abs_error_pct, 2),
+            "mean_bias_pct": round(self.bias_pct, 2),
+            "turns": self.turns,
+            "per_turn_us": round(self.seconds / self.turns * 1e6, 2) if self.turns else None,
+        }
+
+
+def _reported_input_tokens(message: PromptMessageExtended) -> int | None:
+    channels = message.channels or {}
+    blocks = channels.get(FAST_AGENT_USAGE, [])
+    if not blocks:
+        return None
+    payload_text = get_text(blocks[0])
+    if not payload_text:
+        return None
+    try:
+        payload = json.loads(payload_text)
+    except json.JSONDecodeError:
+        return None
+    turn = payload.get("turn") if isinstance(payload, dict) else None
+    if not isinstance(turn, dict):
+        return None
+    tokens = turn.get("input_tokens")
+    return tokens if isinstance(tokens, int) and tokens > 0 else None
+
+
+def _error_pct(estimate: int, actual: int) -> float:
+    return (estimate - actual) / actual * 100
+
+
+def _score(
+    result: EstimatorResult,
+    counter: TokenCounter,
+    messages: list[PromptMessageExtended],
+    reference: TokenCounter | None,
+) -> None:
+    running = 0
+    reference_running = 0
+    for turn in split_into_turns(messages):
+        start = time.perf_counter()
+        for msg in turn:
+            reported = _reported_input_tokens(msg) if msg.role == "assistant" else None
+            if reported is not None and reference is None:
+                # Reported input covers everything before this reply.
+                result.errors.append(_error_pct(running, reported))
+            running += counter.count_message(msg)
+        result.seconds += time.perf_counter() - start
+        result.turns += 1
+
+        if reference is not None:
+            reference_running += sum(reference.count_message(msg) for msg in turn)
+            result.errors.append(_error_pct(running, reference_running))
+
+
+def _benchmark(
+    histories: list[Path],
+    estimators: dict[str, Tokenizer],
+    reference_name: str | None,
+) -> list[dict[str, object]]:
+    loaded = [load_messages(str(path)) for path in histories]
+    reference_tokenizer = estimators.get(reference_name) if reference_name else None
+    results: list[dict[str, object]] = []
+    for name, tokenizer in estimators.items():
+        result = EstimatorResult(name=name)
+        for messages in loaded:
+            has_usage = any(_reported_input_tokens(msg) is not None for msg in messages)
+            reference = (
+                TokenCounter(reference_tokenizer)
+                if reference_tokenizer is not None and not has_usage
+                else None
+            )
+            # Fresh counters so the LRU does not hide per-turn tokenizer cost.
+            _score(result, TokenCounter(tokenizer), messages, reference)
+        if result.errors:
+            result.samples = len(result.errors)
+            result.abs_error_pct = sum(abs(e) for e in result.errors) / len(result.errors)
+            result.bias_pct = sum(result.errors) / len(result.errors)
+        results.append(result.to_dict())
+    return results
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("histories", nargs="+", help="Recorded history files (.json)")
+    parser.add_argument(
+        "--vocab",
+        help=f"Local BPE vocabulary (tiktoken format). Defaults to ${BPE_VOCAB_ENV}.",
+    )
+    parser.add_argument("--output", help="Optional path to write JSON results")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    estimators: dict[str, Tokenizer] = {"heuristic": HeuristicTokenizer()}
+    vocab = args.vocab or os.environ.get(BPE_VOCAB_ENV)
+    if vocab:
+        estimators["bpe"] = BpeTokenizer.from_file(vocab)
+
+    histories = [Path(path).expanduser() for path in args.histories]
+    # Without provider usage in the history, the BPE count is the reference.
+    results = _benchmark(histories, estimators, "bpe" if "bpe" in estimators else None)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).expanduser().write_text(text + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,686 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import asyncio
+import base64
+import bisect
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import re
+import secrets
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Protocol
 
 from mcp.types import CallToolResult, TextContent
 
-from fast_agent.hooks import HookContext, show_hook_message
+from fast_agent.constants import FAST_AGENT_USAGE
+from fast_agent.hooks import HookContext, show_hook_failure, show_hook_message
 from fast_agent.hooks.history_trimmer import trim_tool_loop_history
 from fast_agent.mcp.helpers.content_helpers import get_text
-from fast_agent.types import PromptMessageExtended, split_into_turns
+from fast_agent.types import PromptMessageExtended
 
 if TYPE_CHECKING:
-    from collections.abc import Awaitable, Callable
+    from collections.abc import Awaitable, Callable, Iterable, Iterator
 
 DEFAULT_OMITTED_TEXT = "(tool result omitted)"
+DEFAULT_DUPLICATE_TEXT = "(same as tool result {tool_id})"
+SPILLED_TEXT = "(tool result spilled: call fetch_spilled_result with key {key})"
+# Per-hook metrics, one JSON block per compaction (same clock as fast-agent-timing).
+FAST_AGENT_COMPACTION = "fast-agent-compaction"
+# Default compaction_prompt max_result_chars: tool results keep this many characters
+# (head and tail) in the transcript.
+DEFAULT_RESULT_EXCERPT_CHARS = 4000
+TRANSCRIPT_TRUNCATED_TEXT = "[earlier transcript omitted at token budget]"
+# Spill segments default to <session directory>/spill (.fast-agent/spill without a session).
+SPILL_DIR_ENV = "FAST_AGENT_SPILL_DIR"
+# Cached summaries default to <session directory>/compaction-cache (likewise .fast-agent).
+SUMMARY_CACHE_DIR_ENV = "FAST_AGENT_COMPACTION_CACHE_DIR"
+# Optional local BPE vocabulary (tiktoken format: "<base64 token> <rank>" per line).
+BPE_VOCAB_ENV = "FAST_AGENT_COMPACTION_BPE_VOCAB"
 DEFAULT_COMPACTION_PROMPT = (
     "Summarize the conversation so far. Preserve user goals, constraints, "
     "decisions, and open tasks. Be concise."
 )
+DEFAULT_MERGE_PROMPT = (
+    "Update the previous summary with the new conversation turns below. Keep what "
+    "still matters, fold in new goals, constraints, decisions, and open tasks, and "
+    "drop resolved items. Be concise."
+)
+DEFAULT_REDUCE_PROMPT = (
+    "Combine these partial summaries of consecutive parts of one conversation into a "
+    "single summary. Preserve user goals, constraints, decisions, and open tasks. "
+    "Be concise."
+)
+
 
+# cl100k-style pre-tokenizer; tiktoken understands \p{..} classes, `re` does not.
+_TIKTOKEN_SPLIT_PATTERN = (
+    r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}+|\p{N}{1,3}"""
+    r"""| ?[^\s\p{L}\p{N}]++[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+)
+_FALLBACK_SPLIT_PATTERN = (
+    r"""'(?:[sdmtSDMT]|ll|ve|re)|[^\r\n\w]?[^\W\d_]+|\d{1,3}"""
+    r"""| ?[^\s\w]+[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+)
 
-def _flatten_turns(turns: list[list[PromptMessageExtended]]) -> list[PromptMessageExtended]:
-    return [msg for turn in turns for msg in turn]
 
+class Tokenizer(Protocol):
+    """Anything that can count tokens in a string."""
 
-def _keep_last_turns(
+    def count(self, text: str) -> int: ...
+
+
+class HeuristicTokenizer:
+    """Fallback estimate: ~4 characters per token."""
+
+    def count(self, text: str) -> int:
+        return max(1, len(text) // 4)
+
+
+class BpeTokenizer:
+    """Byte-pair tokenizer loaded from a local vocabulary file (no network access).
+
+    Uses ``tiktoken`` for encoding when it is installed, otherwise a pure Python
+    merge loop with a per-piece cache.
+    """
+
+    def __init__(self, ranks: dict[bytes, int], *, piece_cache_size: int = 65536) -> None:
+        self._ranks = ranks
+        self._split = re.compile(_FALLBACK_SPLIT_PATTERN)
+        self._piece_cache: OrderedDict[bytes, int] = OrderedDict()
+        self._piece_cache_size = piece_cache_size
+        self._encoding = _tiktoken_encoding(ranks)
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> BpeTokenizer:
+        ranks: dict[bytes, int] = {}
+        for line in Path(path).expanduser().read_bytes().splitlines():
+            if not line.strip():
+                continue
+            token, rank = line.split()
+            ranks[base64.b64decode(token)] = int(rank)
+        return cls(ranks)
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode_ordinary(text))
+        return sum(self._count_piece(piece.encode("utf-8")) for piece in self._split.findall(text))
+
+    def _count_piece(self, piece: bytes) -> int:
+        cached = self._piece_cache.get(piece)
+        if cached is not None:
+            self._piece_cache.move_to_end(piece)
+            return cached
+
+        count = _bpe_merge_count(piece, self._ranks)
+        self._piece_cache[piece] = count
+        if len(self._piece_cache) > self._piece_cache_size:
+            self._piece_cache.popitem(last=False)
+        return count
+
+
+def _tiktoken_encoding(ranks: dict[bytes, int]) -> object | None:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.Encoding(
+        "local-bpe",
+        pat_str=_TIKTOKEN_SPLIT_PATTERN,
+        mergeable_ranks=ranks,
+        special_tokens={},
+    )
+
+
+def _bpe_merge_count(piece: bytes, ranks: dict[bytes, int]) -> int:
+    if piece in ranks:
+        return 1
+    parts = [piece[i : i + 1] for i in range(len(piece))]
+    while len(parts) > 1:
+        best_rank: int | None = None
+        best_index = -1
+        for index in range(len(parts) - 1):
+            rank = ranks.get(parts[index] + parts[index + 1])
+            if rank is not None and (best_rank is None or rank < best_rank):
+                best_rank = rank
+                best_index = index
+        if best_rank is None:
+            break
+        parts[best_index : best_index + 2] = [parts[best_index] + parts[best_index + 1]]
+    return len(parts)
+
+
+class TokenCounter:
+    """Counts message tokens, caching results in an LRU keyed by content hash."""
+
+    def __init__(self, tokenizer: Tokenizer | None = None, *, max_entries: int = 4096) -> None:
+        self.tokenizer: Tokenizer = tokenizer or HeuristicTokenizer()
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+        self._max_entries = max_entries
+
+    def count_text(self, text: str) -> int:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        count = max(1, self.tokenizer.count(text))
+        self._cache[key] = count
+        if len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+        return count
+
+    def count_message(self, msg: PromptMessageExtended) -> int:
+        return self.count_text(_message_text(msg))
+
+
+_token_counter: TokenCounter | None = None
+
+
+def _default_tokenizer() -> Tokenizer:
+    vocab_path = os.environ.get(BPE_VOCAB_ENV)
+    if vocab_path:
+        try:
+            return BpeTokenizer.from_file(vocab_path)
+        except (OSError, ValueError):
+            pass
+    return HeuristicTokenizer()
+
+
+def configure_tokenizer(tokenizer: Tokenizer | None) -> None:
+    """Use ``tokenizer`` for compaction decisions (``None`` restores the default)."""
+    global _token_counter
+    _token_counter = TokenCounter(tokenizer) if tokenizer is not None else None
+    # Only the token counts depend on the tokenizer; summaries, spill stores and
+    # watermarks stay with their agents.
+    for state in _history_state.values():
+        state.ledger = TokenLedger()
+
+
+def _get_token_counter() -> TokenCounter:
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter(_default_tokenizer())
+    return _token_counter
+
+
+def _message_text(msg: PromptMessageExtended) -> str:
+    if not msg.tool_results:
+        return msg.all_text()
+    parts = [msg.all_text()]
+    parts.extend(_tool_result_text(result) for result in msg.tool_results.values())
+    return "\n".join(parts)
+
+
+def _message_tokens(msg: PromptMessageExtended) -> int:
+    return _get_token_counter().count_message(msg)
+
+
+def _estimate_tokens(messages: list[PromptMessageExtended]) -> int:
+    return sum(_message_tokens(msg) for msg in messages)
+
+
+def _appended_from(
+    known: list[PromptMessageExtended],
+    history: list[PromptMessageExtended],
+) -> int | None:
+    """Return the offset of new messages if ``history`` only appended to ``known``.
+
+    Only the first, middle and last known messages are compared by identity, so the
+    check stays O(1) per turn. fast-agent stores deep copies, so a history replaced
+    elsewhere (e.g. ``trim_tool_loop_history``) shares none of them.
+    """
+    count = len(known)
+    if len(history) < count:
+        return None
+    if count and any(history[i] is not known[i] for i in (0, count // 2, count - 1)):
+        return None
+    return count
+
+
+class TokenLedger:
+    """Per-message token counts kept in step with the history between turns.
+
+    Messages appended since the last sync are counted once; when the history is
+    trimmed or replaced, surviving messages keep their cached counts (matched by
+    identity) and dropped messages are subtracted from the total.
+    """
+
+    def __init__(self) -> None:
+        self._messages: list[PromptMessageExtended] = []
+        self._counts: list[int] = []
+        self.total = 0
+
+    def sync(self, history: list[PromptMessageExtended]) -> int:
+        start = _appended_from(self._messages, history)
+        if start is None:
+            self._rebuild(history)
+            return self.total
+
+        for msg in history[start:]:
+            count = _message_tokens(msg)
+            self._messages.append(msg)
+            self._counts.append(count)
+            self.total += count
+        return self.total
+
+    def reset(self, history: list[PromptMessageExtended]) -> int:
+        """Re-sync after a hook replaced messages anywhere in the history."""
+        self._rebuild(history)
+        return self.total
+
+    def recount(self, history: list[PromptMessageExtended], indices: Iterable[int]) -> int:
+        """Re-count the synced messages at ``indices`` after they were edited in place."""
+        for index in indices:
+            count = _message_tokens(history[index])
+            self.total += count - self._counts[index]
+            self._counts[index] = count
+        return self.total
+
+    def rebind(self, history: list[PromptMessageExtended]) -> None:
+        """Track ``history``, a message-by-message copy of the synced one."""
+        self._messages = list(history)
+
+    def _rebuild(self, history: list[PromptMessageExtended]) -> None:
+        # Old messages stay referenced until the swap below, so ids are stable.
+        cached = {id(msg): count for msg, count in zip(self._messages, self._counts)}
+        counts: list[int] = []
+        for msg in history:
+            count = cached.pop(id(msg), None)
+            counts.append(_message_tokens(msg) if count is None else count)
+        self.total = sum(counts)
+        self._messages = list(history)
+        self._counts = counts
+
+
+def _starts_turn(msg: PromptMessageExtended) -> bool:
+    return msg.role == "user" and not msg.tool_results
+
+
+class TurnIndex:
+    """Offsets of turn starts, extended with appended messages between turns.
+
+    Matches ``split_into_turns``: a turn starts at a user message without tool
+    results, and the first message always opens one. When the history is trimmed
+    or replaced, the offsets are rebuilt.
+    """
+
+    def __init__(self) -> None:
+        self._messages: list[PromptMessageExtended] = []
+        self.starts: list[int] = []
+
+    def sync(self, history: list[PromptMessageExtended]) -> list[int]:
+        start = _appended_from(self._messages, history)
+        if start is None:
+            return self.reset(history)
+
+        for index in range(start, len(history)):
+            if index == 0 or _starts_turn(history[index]):
+                self.starts.append(index)
+        self._messages.extend(history[start:])
+        return self.starts
+
+    def reset(self, history: list[PromptMessageExtended]) -> list[int]:
+        self._messages = []
+        self.starts = []
+        return self.sync(history)
+
+
+def _turn_boundary(starts: list[int], turns: int, length: int) -> int:
+    """Offset where the last ``turns`` turns begin."""
+    if turns <= 0:
+        return length
+    return starts[-turns] if len(starts) >= turns else 0
+
+
+def _turn_ranges(starts: list[int], lo: int, hi: int) -> list[tuple[int, int]]:
+    """``(start, end)`` offsets of the turns between ``lo`` and ``hi``."""
+    inner = starts[bisect.bisect_right(starts, lo) : bisect.bisect_left(starts, hi)]
+    cuts = [lo, *inner, hi]
+    return list(zip(cuts, cuts[1:]))
+
+
+@dataclass
+class _Watermark:
+    """Remembers the last message a hook has already processed."""
+
+    message: PromptMessageExtended | None = None
+    index: int = -1
+
+    def start(self, history: list[PromptMessageExtended]) -> int:
+        if (
+            self.message is not None
+            and self.index < len(history)
+            and history[self.index] is self.message
+        ):
+            return self.index + 1
+        return 0
+
+    def advance(self, history: list[PromptMessageExtended]) -> None:
+        self.message = history[-1] if history else None
+        self.index = len(history) - 1
+
+
+def _spill_directory(session_dir: Path | None = None) -> Path:
+    configured = os.environ.get(SPILL_DIR_ENV)
+    if configured:
+        return Path(configured).expanduser()
+    return (session_dir or Path.cwd() / ".fast-agent") / "spill"
+
+
+def _new_segment() -> str:
+    return f"{time.strftime('%y%m%d%H%M')}-{os.getpid()}-{secrets.token_hex(3)}"
+
+
+# Segments written by this process, so fetch_spilled_result finds per-session directories.
+_spill_directories: dict[str, Path] = {}
+
+
+def _segment_path(segment: str) -> Path:
+    known = _spill_directories.get(segment)
+    if known is not None:
+        return known / f"{segment}.spill"
+    # Written by an earlier process: the fallback directory or a resumed session.
+    fallback = _spill_directory() / f"{segment}.spill"
+    if fallback.exists():
+        return fallback
+    sessions = Path.cwd() / ".fast-agent" / "sessions"
+    return next(sessions.glob(f"*/spill/{segment}.spill"), fallback)
+
+
+class SpillStore:
+    """Append-only segment files holding tool result payloads evicted from history.
+
+    Keys have the form ``<segment>:<offset>:<length>`` (hex), so a payload can be
+    read back with nothing but the key. A segment is closed after a quarter of
+    ``max_bytes``; whenever a new one starts, the oldest segments in the directory
+    are removed until it fits in ``max_bytes`` again.
+    """
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        segment: str | None = None,
+        *,
+        max_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.directory = directory or _spill_directory()
+        self.max_bytes = max_bytes
+        self._start_segment(segment or _new_segment())
+
+    @classmethod
+    def for_session(cls, session_dir: Path | None, **kwargs: int) -> SpillStore:
+        return cls(_spill_directory(session_dir), **kwargs)
+
+    def put(self, result: CallToolResult) -> str:
+        payload = result.model_dump_json(by_alias=True, exclude_none=True).encode("utf-8")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self.path.open("ab") as handle:
+            offset = handle.seek(0, os.SEEK_END)
+            handle.write(payload)
+        key = f"{self.segment}:{offset:x}:{len(payload):x}"
+        if offset == 0:
+            self._evict()
+        if offset + len(payload) >= self.max_bytes // 4:
+            self._start_segment(_new_segment())
+        return key
+
+    def _start_segment(self, segment: str) -> None:
+        self.segment = segment
+        self.path = self.directory / f"{segment}.spill"
+        _spill_directories[segment] = self.directory
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.spill"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != self.path:
+                path.unlink(missing_ok=True)
+                total -= size
+
+    @staticmethod
+    def get(key: str, directory: Path | None = None) -> CallToolResult:
+        segment, _, span = key.strip().partition(":")
+        offset_hex, _, length_hex = span.partition(":")
+        if not segment or Path(segment).name != segment or not offset_hex or not length_hex:
+            raise ValueError(f"Invalid spill key: {key}")
+        start = int(offset_hex, 16)
+        end = start + int(length_hex, 16)
+
+        path = directory / f"{segment}.spill" if directory else _segment_path(segment)
+        try:
+            handle = path.open("rb")
+        except FileNotFoundError:
+            raise ValueError(f"Spilled result is no longer available: {key}") from None
+        with handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if end > len(view):
+                raise ValueError(f"Spill key is out of range: {key}")
+            payload = view[start:end]
+        return CallToolResult.model_validate_json(payload)
+
+
+class SummaryCache:
+    """Disk-backed compaction summaries keyed by a hash of the exact request.
+
+    Files are touched on every hit; the least recently used ones are removed once
+    the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory: Path, *, max_bytes: int = 16 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def for_session(cls, session_dir: Path, **kwargs: int) -> SummaryCache:
+        return cls(session_dir / "compaction-cache", **kwargs)
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        path = self.directory / f"{key}.txt"
+        try:
+            summary = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return summary
+
+    def put(self, key: str, summary: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{key}.txt"
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        temp_path.write_text(summary, encoding="utf-8")
+        os.replace(temp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.txt"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def _session_directory(ctx: HookContext) -> Path | None:
+    manager = getattr(ctx.context, "session_manager", None)
+    session = getattr(manager, "current_session", None)
+    directory = getattr(session, "directory", None)
+    return Path(directory) if directory else None
+
+
+def _summary_cache_for(ctx: HookContext) -> SummaryCache:
+    # Resolved per call: the session (and so its directory) can change between turns.
+    configured = os.environ.get(SUMMARY_CACHE_DIR_ENV)
+    if configured:
+        return SummaryCache(Path(configured).expanduser())
+    return SummaryCache.for_session(_session_directory(ctx) or Path.cwd() / ".fast-agent")
+
+
+@dataclass
+class _PendingSummary:
+    """A background summary, the messages it covers, and its metrics record.
+
+    ``covered`` counts the leading messages the summary replaces and
+    ``covered_digest`` hashes the last of them, so the boundary is found again by
+    position even though fast-agent swaps in copies of the messages.
+    """
+
+    task: asyncio.Task[str]
+    covered: int
+    covered_digest: bytes
+    record: _CompactionRecord
+    details: dict[str, object] = field(default_factory=dict)
+
+
+@dataclass
+class _HistoryState:
+    """Per-agent bookkeeping kept between hook invocations."""
+
+    ledger: TokenLedger = field(default_factory=TokenLedger)
+    turns: TurnIndex = field(default_factory=TurnIndex)
+    watermarks: dict[str, _Watermark] = field(default_factory=dict)
+    summary: PromptMessageExtended | None = None
+    pending: _PendingSummary | None = None
+    result_hashes: dict[bytes, list[str]] = field(default_factory=dict)
+    spill: SpillStore | None = None
+
+    def spill_store(self, ctx: HookContext) -> SpillStore:
+        if self.spill is None:
+            self.spill = SpillStore.for_session(_session_directory(ctx))
+        return self.spill
+
+    def watermark(self, name: str) -> _Watermark:
+        return self.watermarks.setdefault(name, _Watermark())
+
+
+_history_state: weakref.WeakKeyDictionary[object, _HistoryState] = weakref.WeakKeyDictionary()
+
+
+def _state_for(ctx: HookContext) -> _HistoryState:
+    state = _history_state.get(ctx.agent)
+    if state is None:
+        state = _HistoryState()
+        _history_state[ctx.agent] = state
+    return state
+
+
+def load_history(
+    ctx: HookContext,
     messages: list[PromptMessageExtended],
+) -> list[PromptMessageExtended]:
+    """Replace the agent's history and keep this module's per-agent state in step.
+
+    Use it instead of ``ctx.load_message_history`` in hooks that run alongside
+    these ones. fast-agent stores deep copies, so the token ledger and turn index
+    are re-pointed at the stored messages, which are returned.
+    """
+    ctx.load_message_history(messages)
+    stored = ctx.message_history
+    state = _state_for(ctx)
+    state.ledger.reset(messages)
+    if len(stored) == len(messages):
+        state.ledger.rebind(stored)
+    else:
+        state.ledger.reset(stored)
+    state.turns.reset(stored)
+    return stored
+
+
+def _keep_last_turns(
+    ctx: HookContext,
+    history: list[PromptMessageExtended],
     turns: int,
 ) -> list[PromptMessageExtended]:
-    if turns <= 0:
-        return []
-    all_turns = split_into_turns(messages)
-    if len(all_turns) <= turns:
-        return messages
-    return _flatten_turns(all_turns[-turns:])
+    starts = _state_for(ctx).turns.sync(history)
+    boundary = _turn_boundary(starts, turns, len(history))
+    return history[boundary:] if boundary else history
 
 
-def _estimate_tokens(messages: list[PromptMessageExtended]) -> int:
-    # Simple heuristic: ~4 chars per token
-    return sum(max(1, len(msg.all_text()) // 4) for msg in messages)
+_SPILLED_PREFIX = SPILLED_TEXT.partition("{")[0]
+
+
+def _is_placeholder(result: CallToolResult, placeholder: str) -> bool:
+    if result.structured_content is not None or len(result.content) != 1:
+        return False
+    text = get_text(result.content[0])
+    return text == placeholder or bool(text and text.startswith(_SPILLED_PREFIX))
 
 
 def _strip_tool_results(
     results: dict[str, CallToolResult],
     *,
     placeholder: str,
-) -> dict[str, CallToolResult]:
+    tool_ids: set[str] | None = None,
+    spill: SpillStore | None = None,
+) -> dict[str, CallToolResult] | None:
+    """Replace payloads with ``placeholder``; ``None`` when nothing needed stripping.
+
+    Only results in ``tool_ids`` are stripped when it is given. With ``spill``, the
+    payload is written to the spill store and the placeholder carries its key.
+    """
     stripped: dict[str, CallToolResult] = {}
+    changed = False
     for tool_id, result in results.items():
+        if (tool_ids is not None and tool_id not in tool_ids) or _is_placeholder(
+            result, placeholder
+        ):
+            stripped[tool_id] = result
+            continue
+        text = SPILLED_TEXT.format(key=spill.put(result)) if spill is not None else placeholder
         stripped[tool_id] = CallToolResult(
-            content=[TextContent(type="text", text=placeholder)],
-            structuredContent=None,
-            isError=result.isError,
+            content=[TextContent(type="text", text=text)],
+            structured_content=None,
+            is_error=result.is_error,
         )
-    return stripped
+        changed = True
+    return stripped if changed else None
+
+
+def _replace_tool_results(
+    ctx: HookContext,
+    record: _CompactionRecord,
+    history: list[PromptMessageExtended],
+    updates: dict[int, dict[str, CallToolResult]],
+) -> None:
+    """Swap ``tool_results`` on the stored messages at the given offsets.
+
+    The history holds fast-agent's own copies, so they are edited in place rather
+    than reloading (and deep-copying) the whole history every turn.
+    """
+    record.before(ctx, history)
+    for index, results in updates.items():
+        history[index].tool_results = results
+    _state_for(ctx).ledger.recount(history, updates)
 
 
 def _tool_result_text(result: CallToolResult) -> str:
@@ -64,23 +692,291 @@ def _tool_result_text(result: CallToolResult) -> str:
     return "\n".join(parts).strip()
 
 
-def _format_history(messages: list[PromptMessageExtended]) -> str:
-    blocks: list[str] = []
-    for msg in messages:
-        text = msg.all_text().strip()
-        if text:
-            blocks.append(f"{msg.role}:\n{text}")
-        if msg.tool_calls:
-            tool_names = ", ".join(call.params.name for call in msg.tool_calls.values())
-            blocks.append(f"{msg.role} TOOL_CALLS: {tool_names}")
-        if msg.tool_results:
+def _call_argument_values(arguments: object) -> set[str]:
+    values: set[str] = set()
+    if isinstance(arguments, str):
+        values.add(arguments)
+    elif isinstance(arguments, dict):
+        for value in arguments.values():
+            values |= _call_argument_values(value)
+    elif isinstance(arguments, list):
+        for value in arguments:
+            values |= _call_argument_values(value)
+    return values
+
+
+def _eviction_candidates(
+    history: list[PromptMessageExtended],
+    starts: list[int],
+    *,
+    keep_turns: int,
+    min_result_tokens: int,
+    placeholder: str,
+) -> list[tuple[float, int, str, int]]:
+    """Heap of ``(-score, message index, tool id, tokens)`` for evictable results.
+
+    Score grows with size and age (in turns); results whose tool call arguments
+    (paths, queries, ...) show up again in a later tool call score lower.
+    """
+    boundary = _turn_boundary(starts, keep_turns, len(history))
+    call_arguments: dict[str, set[str]] = {}
+    for msg in history:
+        for tool_id, call in (msg.tool_calls or {}).items():
+            call_arguments[tool_id] = _call_argument_values(call.params.arguments)
+
+    counter = _get_token_counter()
+    heap: list[tuple[float, int, str, int]] = []
+    later_arguments: set[str] = set()
+    for index in range(len(history) - 1, -1, -1):
+        msg = history[index]
+        if msg.tool_results and index < boundary:
+            age = len(starts) - bisect.bisect_right(starts, index)
             for tool_id, result in msg.tool_results.items():
-                result_text = _tool_result_text(result)
-                if result_text:
-                    blocks.append(f"TOOL_RESULT {tool_id}:\n{result_text}")
+                if _is_placeholder(result, placeholder):
+                    continue
+                tokens = counter.count_text(_tool_result_text(result))
+                if tokens < min_result_tokens:
+                    continue
+                referenced = bool(call_arguments.get(tool_id, set()) & later_arguments)
+                score = tokens * (1 + age) / (4 if referenced else 1)
+                heap.append((-score, index, tool_id, tokens))
+        for tool_id in msg.tool_calls or {}:
+            later_arguments |= call_arguments.get(tool_id, set())
+    heapq.heapify(heap)
+    return heap
+
+
+def _take_chars(parts: Iterable[str], limit: int, *, from_end: bool = False) -> list[str]:
+    taken: list[str] = []
+    for text in parts:
+        if limit <= 0:
+            break
+        taken.append(text[-limit:] if from_end else text[:limit])
+        limit -= len(text) + 1
+    return taken
+
+
+def _tool_result_excerpt(result: CallToolResult, max_chars: int | None) -> str:
+    """Result text, reduced to a head/tail excerpt without joining oversized parts."""
+    parts = [text for content in result.content if (text := get_text(content))]
+    total = sum(map(len, parts)) + max(0, len(parts) - 1)
+    if max_chars is None or total <= max_chars:
+        return "\n".join(parts).strip()
+
+    head = "\n".join(_take_chars(parts, max_chars // 2))
+    tail_parts = _take_chars(reversed(parts), max_chars - max_chars // 2, from_end=True)
+    tail = "\n".join(reversed(tail_parts))
+    omitted = total - len(head) - len(tail)
+    return f"{head.lstrip()}\n...[{omitted} characters omitted]...\n{tail.rstrip()}"
+
+
+def _message_blocks(
+    msg: PromptMessageExtended,
+    max_result_chars: int | None,
+    placeholder: str,
+) -> Iterator[str]:
+    text = msg.all_text().strip()
+    if text:
+        yield f"{msg.role}:\n{text}"
+    if msg.tool_calls:
+        tool_names = ", ".join(call.params.name for call in msg.tool_calls.values())
+        yield f"{msg.role} TOOL_CALLS: {tool_names}"
+    if msg.tool_results:
+        for tool_id, result in msg.tool_results.items():
+            if _is_placeholder(result, placeholder):
+                continue
+            result_text = _tool_result_excerpt(result, max_result_chars)
+            if result_text:
+                yield f"TOOL_RESULT {tool_id}:\n{result_text}"
+
+
+def _iter_transcript(
+    messages: list[PromptMessageExtended],
+    *,
+    max_result_chars: int | None = DEFAULT_RESULT_EXCERPT_CHARS,
+    token_budget: int | None = None,
+    placeholder: str = DEFAULT_OMITTED_TEXT,
+) -> Iterator[str]:
+    """Yield transcript blocks; past ``token_budget``, the oldest give way to a marker.
+
+    The newest turns matter most to the summary, so the budget is spent from the end
+    and older messages are not formatted at all once it runs out.
+    """
+    if token_budget is None:
+        for msg in messages:
+            yield from _message_blocks(msg, max_result_chars, placeholder)
+        return
+
+    tokenizer = _get_token_counter().tokenizer
+    kept: list[str] = []
+    used = 0
+    for msg in reversed(messages):
+        blocks = list(_message_blocks(msg, max_result_chars, placeholder))
+        for block in reversed(blocks):
+            used += tokenizer.count(block)
+            if used > token_budget:
+                yield TRANSCRIPT_TRUNCATED_TEXT
+                yield from reversed(kept)
+                return
+            kept.append(block)
+    yield from reversed(kept)
+
+
+def _format_history(
+    messages: list[PromptMessageExtended],
+    *,
+    max_result_chars: int | None = DEFAULT_RESULT_EXCERPT_CHARS,
+    token_budget: int | None = None,
+    placeholder: str = DEFAULT_OMITTED_TEXT,
+) -> str:
+    blocks = _iter_transcript(
+        messages,
+        max_result_chars=max_result_chars,
+        token_budget=token_budget,
+        placeholder=placeholder,
+    )
     return "\n\n".join(blocks).strip()
 
 
+def _previous_summary(
+    state: _HistoryState,
+    history: list[PromptMessageExtended],
+) -> PromptMessageExtended | None:
+    """Return the head of ``history`` if it is the summary written last time."""
+    summary = state.summary
+    if summary is None or not history:
+        return None
+    head = history[0]
+    if head is summary:
+        return head
+    # Reloaded sessions rebuild message objects; fall back to comparing text.
+    if head.role == "assistant" and not head.tool_calls and head.all_text() == summary.all_text():
+        return head
+    return None
+
+
+def _summary_message(summary_text: str) -> PromptMessageExtended:
+    return PromptMessageExtended(
+        role="assistant",
+        content=[TextContent(type="text", text=summary_text)],
+    )
+
+
+def _tail_digest(history: list[PromptMessageExtended], end: int, size: int = 3) -> bytes:
+    """Hash of the ``size`` messages before ``end``, unchanged by copies or cleared results."""
+    digest = hashlib.blake2b(digest_size=16)
+    for msg in history[max(0, end - size) : end]:
+        for part in (msg.role, msg.all_text(), *(msg.tool_calls or {}), *(msg.tool_results or {})):
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+    return digest.digest()
+
+
+def _chunk_turns(
+    history: list[PromptMessageExtended],
+    turns: list[tuple[int, int]],
+    chunk_tokens: int,
+) -> list[list[PromptMessageExtended]]:
+    """Group whole turns into chunks of roughly ``chunk_tokens`` estimated tokens."""
+    chunks: list[list[PromptMessageExtended]] = []
+    current: list[PromptMessageExtended] = []
+    current_tokens = 0
+    for start, end in turns:
+        turn = history[start:end]
+        turn_tokens = _estimate_tokens(turn)
+        if current and current_tokens + turn_tokens > chunk_tokens:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.extend(turn)
+        current_tokens += turn_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _request_summary(
+    sender: Callable[[str], Awaitable[str]],
+    transcripts: list[str],
+    *,
+    prompt: str,
+    previous_text: str | None,
+    merge_prompt: str,
+    reduce_prompt: str,
+    max_concurrency: int,
+) -> str:
+    if len(transcripts) == 1:
+        body = transcripts[0]
+    else:
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def summarize_chunk(transcript: str) -> str:
+            async with semaphore:
+                return await sender(f"{prompt}\n\n{transcript}")
+
+        tasks = [asyncio.ensure_future(summarize_chunk(t)) for t in transcripts]
+        try:
+            partials = await asyncio.gather(*tasks)
+        except BaseException:
+            # One failed chunk fails the summary; stop the others instead of paying for them.
+            for task in tasks:
+                task.cancel()
+            raise
+        body = "\n\n".join(
+            f"PART {index}:\n{partial}" for index, partial in enumerate(partials, start=1)
+        )
+        if previous_text is None:
+            return await sender(f"{reduce_prompt}\n\n{body}")
+
+    if previous_text is not None:
+        return await sender(
+            f"{merge_prompt}\n\nPREVIOUS SUMMARY:\n{previous_text}\n\nNEW TURNS:\n{body}"
+        )
+    return await sender(f"{prompt}\n\n{body}")
+
+
+def _agent_identity(agent: object) -> tuple[str, str]:
+    name = getattr(agent, "name", None) or ""
+    model = getattr(getattr(agent, "config", None), "model", None)
+    if not model:
+        model = getattr(getattr(agent, "llm", None), "model_name", None)
+    return str(name), str(model or "")
+
+
+async def _store_summary(cache: SummaryCache, key: str, summary: Awaitable[str]) -> str:
+    summary_text = await summary
+    cache.put(key, summary_text)
+    return summary_text
+
+
+async def _timed_summary(summary: Awaitable[str], details: dict[str, object]) -> str:
+    start = time.perf_counter()
+    summary_text = await summary
+    details["compactor_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    details["compactor_output_tokens"] = _get_token_counter().count_text(summary_text)
+    return summary_text
+
+
+def _install_summary(
+    ctx: HookContext,
+    state: _HistoryState,
+    summary_text: str,
+    remaining: list[PromptMessageExtended],
+    note: str,
+    *,
+    record: _CompactionRecord,
+    reason: str,
+    **details: object,
+) -> None:
+    summary_message = _summary_message(summary_text)
+    record.before(ctx, ctx.message_history)
+    history = load_history(ctx, [summary_message, *remaining])
+    state.summary = history[0]
+    record.emit(ctx, reason, **details)
+    show_hook_message(ctx, note, hook_name="compaction_prompt", hook_kind="tool")
+
+
 def _get_sender(
     target_agent: object,
 ) -> Callable[[str], Awaitable[str]] | None:
@@ -90,14 +986,104 @@ def _get_sender(
     return None
 
 
+@dataclass
+class _CompactionRecord:
+    """Metrics for one hook run, appended to the ``fast-agent-compaction`` channel."""
+
+    hook: str
+    start_time: float = field(default_factory=time.perf_counter)
+    messages_before: int = 0
+    tokens_before: int = 0
+
+    def before(self, ctx: HookContext, history: list[PromptMessageExtended]) -> None:
+        self.messages_before = len(history)
+        self.tokens_before = _state_for(ctx).ledger.sync(history)
+
+    def emit(self, ctx: HookContext, reason: str, **details: object) -> None:
+        history = ctx.message_history
+        if not history:
+            return
+        # fast-agent keeps deep copies, so the block goes on the stored last message.
+        message = history[-1]
+        end_time = time.perf_counter()
+        payload = {
+            "hook": self.hook,
+            "start_time": self.start_time,
+            "end_time": end_time,
+            "duration_ms": round((end_time - self.start_time) * 1000, 3),
+            "reason": reason,
+            "messages_before": self.messages_before,
+            "messages_after": len(history),
+            "tokens_before": self.tokens_before,
+            "tokens_after": _state_for(ctx).ledger.sync(history),
+            **details,
+        }
+        channels = dict(message.channels or {})
+        block = TextContent(type="text", text=json.dumps(payload))
+        channels[FAST_AGENT_COMPACTION] = [*channels.get(FAST_AGENT_COMPACTION, []), block]
+        message.channels = channels
+
+
+@dataclass
+class _CacheUsage:
+    read_tokens: int
+    write_tokens: int
+
+
+def _cache_usage(message: PromptMessageExtended | None) -> _CacheUsage | None:
+    """Prompt-cache token counts for the turn, from the ``fast-agent-usage`` channel."""
+    channels = (message.channels if message is not None else None) or {}
+    blocks = channels.get(FAST_AGENT_USAGE, [])
+    payload_text = get_text(blocks[0]) if blocks else None
+    if not payload_text:
+        return None
+    try:
+        payload = json.loads(payload_text)
+    except json.JSONDecodeError:
+        return None
+    turn = payload.get("turn") if isinstance(payload, dict) else None
+    cache = turn.get("cache_usage") if isinstance(turn, dict) else None
+    if not isinstance(cache, dict):
+        return None
+
+    def _int(value: object) -> int:
+        return int(value) if isinstance(value, (int, float)) else 0
+
+    return _CacheUsage(
+        read_tokens=_int(cache.get("cache_read_tokens")) + _int(cache.get("cache_hit_tokens")),
+        write_tokens=_int(cache.get("cache_write_tokens")),
+    )
+
+
+def _over_threshold(
+    ctx: HookContext,
+    threshold_percent: float,
+    max_tokens: int | None,
+) -> str | None:
+    """Why the context is over its limit, or ``None`` while it fits."""
+    usage = ctx.usage
+    if usage and usage.context_usage_percentage is not None:
+        if usage.context_usage_percentage > threshold_percent:
+            return f"context usage over {threshold_percent}%"
+        return None
+    if max_tokens is None:
+        return None
+    if _state_for(ctx).ledger.sync(ctx.message_history) > max_tokens:
+        return f"estimated tokens over {max_tokens}"
+    return None
+
+
 async def rolling_window(ctx: HookContext, *, turns: int = 8) -> None:
     if not ctx.is_turn_complete:
         return
+    record = _CompactionRecord("rolling_window")
     history = ctx.message_history
-    trimmed = _keep_last_turns(history, turns)
+    trimmed = _keep_last_turns(ctx, history, turns)
     if len(trimmed) == len(history):
         return
-    ctx.load_message_history(trimmed)
+    record.before(ctx, history)
+    load_history(ctx, trimmed)
+    record.emit(ctx, f"more than {turns} turns")
     show_hook_message(
         ctx, f"kept last {turns} turns", hook_name="rolling_window", hook_kind="tool"
     )
@@ -112,23 +1098,19 @@ async def truncate_over_threshold(
 ) -> None:
     if not ctx.is_turn_complete:
         return
-
-    usage = ctx.usage
-    if usage and usage.context_usage_percentage is not None:
-        if usage.context_usage_percentage <= threshold_percent:
-            return
-    else:
-        if max_tokens is None:
-            return
-        if _estimate_tokens(ctx.message_history) <= max_tokens:
-            return
+    record = _CompactionRecord("truncate_over_threshold")
+    reason = _over_threshold(ctx, threshold_percent, max_tokens)
+    if reason is None:
+        return
 
     history = ctx.message_history
-    trimmed = _keep_last_turns(history, keep_turns)
+    trimmed = _keep_last_turns(ctx, history, keep_turns)
     if len(trimmed) == len(history):
         return
 
-    ctx.load_message_history(trimmed)
+    record.before(ctx, history)
+    load_history(ctx, trimmed)
+    record.emit(ctx, reason)
     show_hook_message(
         ctx,
         f"trimmed history (threshold {threshold_percent}%, kept {keep_turns} turns)",
@@ -137,35 +1119,115 @@ async def truncate_over_threshold(
     )
 
 
+def _template_prefix(history: list[PromptMessageExtended]) -> int:
+    """Length of the leading run of template messages (the cached prompt prefix)."""
+    for index, message in enumerate(history):
+        if not message.is_template:
+            return index
+    return len(history)
+
+
+async def cache_aware_window(
+    ctx: HookContext,
+    *,
+    max_turns: int = 16,
+    keep_turns: int = 8,
+    threshold_percent: float = 85.0,
+    max_tokens: int | None = None,
+    cache_read_cost: float = 0.1,
+    cache_write_cost: float = 1.25,
+) -> None:
+    """Trim from ``max_turns`` down to ``keep_turns`` in one step, when it pays off.
+
+    Prompt caches are prefix caches, so a trim keeps only the cache entry that ends
+    before the cut. The cut is therefore made right after the template messages
+    (``is_template``), where fast-agent places its prompt-cache breakpoint, and the
+    template prefix is kept: system, tools and templates are still read from cache
+    and only the kept turns are written again. Conversation breakpoints (fast-agent
+    marks the last user messages) cannot survive a trim from the front.
+
+    While the cache is warm (per the ``fast-agent-usage`` channel), a step waits
+    until the input saved over the next ``max_turns - keep_turns`` turns at
+    ``cache_read_cost`` outweighs re-writing the kept turns at ``cache_write_cost``
+    (both relative to the uncached input price). Past ``threshold_percent`` context
+    usage or ``max_tokens`` estimated tokens, it trims regardless.
+    """
+    if not ctx.is_turn_complete:
+        return
+
+    record = _CompactionRecord("cache_aware_window")
+    history = ctx.message_history
+    state = _state_for(ctx)
+    prefix = _template_prefix(history)
+    starts = state.turns.sync(history)
+    starts = starts[bisect.bisect_left(starts, prefix) :]
+    over_limit = _over_threshold(ctx, threshold_percent, max_tokens)
+    if len(starts) <= keep_turns or (len(starts) <= max_turns and over_limit is None):
+        return
+
+    boundary = max(prefix, _turn_boundary(starts, keep_turns, len(history)))
+    rewritten = history[boundary:]
+    kept = [*history[:prefix], *rewritten]
+    cache = _cache_usage(ctx.message)
+    if over_limit is None and cache is not None and cache.read_tokens > cache.write_tokens:
+        rewritten_tokens = _estimate_tokens(rewritten)
+        removed_tokens = state.ledger.sync(history) - _estimate_tokens(kept)
+        saved = removed_tokens * cache_read_cost * max(1, max_turns - keep_turns)
+        if saved < rewritten_tokens * (cache_write_cost - cache_read_cost):
+            return
+
+    record.before(ctx, history)
+    load_history(ctx, kept)
+    reason = over_limit or f"more than {max_turns} turns"
+    record.emit(
+        ctx,
+        reason,
+        cache_read_tokens=cache.read_tokens if cache is not None else None,
+        cache_write_tokens=cache.write_tokens if cache is not None else None,
+    )
+    show_hook_message(
+        ctx,
+        f"trimmed to last {keep_turns} turns ({reason})",
+        hook_name="cache_aware_window",
+        hook_kind="tool",
+    )
+
+
 async def clear_results_soft(
     ctx: HookContext,
     *,
     placeholder: str = DEFAULT_OMITTED_TEXT,
+    spill: bool = False,
 ) -> None:
+    """Strip tool result payloads; ``spill=True`` keeps them retrievable by key."""
     if not ctx.is_turn_complete:
         return
 
+    record = _CompactionRecord("clear_results_soft")
     history = ctx.message_history
-    updated: list[PromptMessageExtended] = []
-    changed = False
+    state = _state_for(ctx)
+    watermark = state.watermark("clear_results_soft")
+    spill_store = state.spill_store(ctx) if spill else None
+    updates: dict[int, dict[str, CallToolResult]] = {}
 
-    for message in history:
+    for index in range(watermark.start(history), len(history)):
+        message = history[index]
         if not message.tool_results:
-            updated.append(message)
             continue
-
-        msg_copy = message.model_copy(deep=True)
-        msg_copy.tool_results = _strip_tool_results(
+        stripped = _strip_tool_results(
             message.tool_results,
             placeholder=placeholder,
+            spill=spill_store,
         )
-        updated.append(msg_copy)
-        changed = True
+        if stripped is not None:
+            updates[index] = stripped
 
-    if not changed:
+    watermark.advance(history)
+    if not updates:
         return
 
-    ctx.load_message_history(updated)
+    _replace_tool_results(ctx, record, history, updates)
+    record.emit(ctx, "new tool results", spilled=spill)
     show_hook_message(
         ctx,
         "cleared tool result payloads",
@@ -174,14 +1236,143 @@ async def clear_results_soft(
     )
 
 
+async def evict_tool_results(
+    ctx: HookContext,
+    *,
+    target_tokens: int = 12000,
+    keep_turns: int = 2,
+    min_result_tokens: int = 200,
+    placeholder: str = DEFAULT_OMITTED_TEXT,
+    spill: bool = False,
+) -> None:
+    """Evict the most expensive, least relevant tool results until under budget."""
+    if not ctx.is_turn_complete:
+        return
+
+    record = _CompactionRecord("evict_tool_results")
+    history = ctx.message_history
+    state = _state_for(ctx)
+    total = state.ledger.sync(history)
+    if total <= target_tokens:
+        return
+
+    heap = _eviction_candidates(
+        history,
+        state.turns.sync(history),
+        keep_turns=keep_turns,
+        min_result_tokens=min_result_tokens,
+        placeholder=placeholder,
+    )
+    placeholder_tokens = _get_token_counter().count_text(placeholder)
+    evicted: dict[int, set[str]] = {}
+    saved = 0
+    while heap and total - saved > target_tokens:
+        _, index, tool_id, tokens = heapq.heappop(heap)
+        evicted.setdefault(index, set()).add(tool_id)
+        saved += max(0, tokens - placeholder_tokens)
+
+    if not evicted:
+        return
+
+    updates: dict[int, dict[str, CallToolResult]] = {}
+    for index, tool_ids in evicted.items():
+        stripped = _strip_tool_results(
+            history[index].tool_results or {},
+            placeholder=placeholder,
+            tool_ids=tool_ids,
+            spill=state.spill_store(ctx) if spill else None,
+        )
+        if stripped is not None:
+            updates[index] = stripped
+
+    _replace_tool_results(ctx, record, history, updates)
+    record.emit(
+        ctx,
+        f"estimated tokens over {target_tokens}",
+        evicted=sum(len(ids) for ids in evicted.values()),
+        spilled=spill,
+    )
+    show_hook_message(
+        ctx,
+        f"evicted {sum(len(ids) for ids in evicted.values())} tool results (~{saved} tokens)",
+        hook_name="evict_tool_results",
+        hook_kind="tool",
+    )
+
+
+async def dedupe_tool_results(
+    ctx: HookContext,
+    *,
+    min_chars: int = 200,
+    reference_text: str = DEFAULT_DUPLICATE_TEXT,
+) -> None:
+    """Replace earlier copies of repeated tool results with a reference to the newest."""
+    if not ctx.is_turn_complete:
+        return
+
+    record = _CompactionRecord("dedupe_tool_results")
+    history = ctx.message_history
+    state = _state_for(ctx)
+    watermark = state.watermark("dedupe_tool_results")
+    start = watermark.start(history)
+    if start == 0:
+        state.result_hashes.clear()
+
+    superseded: dict[str, str] = {}
+    for msg in history[start:]:
+        for tool_id, result in (msg.tool_results or {}).items():
+            text = _tool_result_text(result)
+            if len(text) < min_chars:
+                continue
+            digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            copies = state.result_hashes.setdefault(digest, [])
+            for older in copies:
+                superseded[older] = tool_id
+            copies.append(tool_id)
+
+    if not superseded:
+        watermark.advance(history)
+        return
+
+    updates: dict[int, dict[str, CallToolResult]] = {}
+    for index, message in enumerate(history):
+        if not message.tool_results or superseded.keys().isdisjoint(message.tool_results):
+            continue
+        results = dict(message.tool_results)
+        for tool_id, result in message.tool_results.items():
+            if tool_id in superseded:
+                results[tool_id] = CallToolResult(
+                    content=[
+                        TextContent(
+                            type="text",
+                            text=reference_text.format(tool_id=superseded[tool_id]),
+                        )
+                    ],
+                    structured_content=None,
+                    is_error=result.is_error,
+                )
+        updates[index] = results
+
+    watermark.advance(history)
+    _replace_tool_results(ctx, record, history, updates)
+    record.emit(ctx, "repeated tool results", replaced=len(superseded))
+    show_hook_message(
+        ctx,
+        f"replaced {len(superseded)} repeated tool results with references",
+        hook_name="dedupe_tool_results",
+        hook_kind="tool",
+    )
+
+
 async def clear_results_hard(ctx: HookContext) -> None:
     if not ctx.is_turn_complete:
         return
 
-    before = len(ctx.message_history)
+    record = _CompactionRecord("clear_results_hard")
+    record.before(ctx, ctx.message_history)
     await trim_tool_loop_history(ctx)
-    after = len(ctx.message_history)
-    if after < before:
+    if len(ctx.message_history) < record.messages_before:
+        record.emit(ctx, "tool loop history")
         show_hook_message(
             ctx,
             "trimmed tool loop history",
@@ -197,22 +1388,82 @@ async def compaction_prompt(
     min_turns: int = 6,
     compactor_agent: str | None = None,
     prompt: str = DEFAULT_COMPACTION_PROMPT,
+    incremental: bool = False,
+    merge_prompt: str = DEFAULT_MERGE_PROMPT,
+    background: bool = False,
+    chunk_tokens: int | None = None,
+    max_concurrency: int = 4,
+    reduce_prompt: str = DEFAULT_REDUCE_PROMPT,
+    cache_summaries: bool = False,
+    max_result_chars: int | None = DEFAULT_RESULT_EXCERPT_CHARS,
+    transcript_tokens: int | None = None,
+    placeholder: str = DEFAULT_OMITTED_TEXT,
 ) -> None:
+    """Replace older turns with a summary from the compactor agent.
+
+    Tool results are cut to a head/tail excerpt of ``max_result_chars`` characters
+    (``None`` sends them whole). Results already cleared to ``placeholder`` (match
+    the clearing hook's placeholder) or spilled are skipped. With
+    ``transcript_tokens`` set, each transcript keeps its newest blocks within that
+    budget and the oldest are replaced by a marker.
+
+    With ``cache_summaries=True``, summaries are stored under the session directory
+    keyed by the transcript, prompts and compactor agent/model, so resumed, forked
+    or replayed sessions reuse them instead of calling the compactor again.
+
+    With ``chunk_tokens`` set, larger transcripts are split on turn boundaries,
+    the chunks are summarised concurrently (at most ``max_concurrency`` at once)
+    and the partial summaries are reduced into one. The compactor agent should
+    run with ``use_history: false`` so concurrent requests stay independent.
+    Without a ``compactor_agent`` the chunks go to the agent itself one at a time.
+
+    With ``background=True`` and a dedicated ``compactor_agent``, the summary is
+    requested in an asyncio task and swapped in later by
+    ``apply_pending_compaction`` (wire it to ``before_llm_call``).
+    """
     if not ctx.is_turn_complete:
         return
 
+    record = _CompactionRecord("compaction_prompt")
+    state = _state_for(ctx)
+    if state.pending is not None:
+        if state.pending.task.done():
+            _apply_pending_summary(ctx, state)
+        return
+
     history = ctx.message_history
-    turns = split_into_turns(history)
-    if len(turns) <= max(min_turns, keep_turns + 1):
+    starts = state.turns.sync(history)
+    if len(starts) <= max(min_turns, keep_turns + 1):
         return
+    reason = f"more than {max(min_turns, keep_turns + 1)} turns"
 
-    recent = _flatten_turns(turns[-keep_turns:])
-    to_summarize = _flatten_turns(turns[:-keep_turns])
+    boundary = _turn_boundary(starts, keep_turns, len(history))
+    recent = history[boundary:]
+    previous = _previous_summary(state, history) if incremental else None
+    # The previous summary covers everything before it; only newer turns are sent.
+    first = 1 if previous is not None else 0
+    to_summarize = history[first:boundary]
     if not to_summarize:
         return
 
-    transcript = _format_history(to_summarize)
-    if not transcript:
+    chunks = (
+        _chunk_turns(history, _turn_ranges(starts, first, boundary), chunk_tokens)
+        if chunk_tokens
+        else [to_summarize]
+    )
+    transcripts = [
+        transcript
+        for chunk in chunks
+        if (
+            transcript := _format_history(
+                chunk,
+                max_result_chars=max_result_chars,
+                token_budget=transcript_tokens,
+                placeholder=placeholder,
+            )
+        )
+    ]
+    if not transcripts:
         return
 
     target_agent = ctx.get_agent(compactor_agent) if compactor_agent else ctx.agent
@@ -220,16 +1471,136 @@ async def compaction_prompt(
     if sender is None:
         return
 
-    summary_text = await sender(f"{prompt}\n\n{transcript}")
-    summary_message = PromptMessageExtended(
-        role="assistant",
-        content=[TextContent(type="text", text=summary_text)],
+    previous_text = previous.all_text() if previous is not None else None
+    cache = _summary_cache_for(ctx) if cache_summaries else None
+    cache_key = ""
+    if cache is not None:
+        cache_key = SummaryCache.key(
+            *_agent_identity(target_agent),
+            prompt,
+            merge_prompt,
+            reduce_prompt,
+            previous_text or "",
+            *transcripts,
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            _install_summary(
+                ctx,
+                state,
+                cached,
+                recent,
+                "compacted history from cached summary",
+                record=record,
+                reason=reason,
+                cache_hit=True,
+            )
+            return
+
+    counter = _get_token_counter()
+    details: dict[str, object] = {
+        "compactor_input_tokens": sum(map(counter.count_text, transcripts))
+        + (counter.count_text(previous_text) if previous_text else 0),
+        "chunks": len(transcripts),
+    }
+    summary = _timed_summary(
+        _request_summary(
+            sender,
+            transcripts,
+            prompt=prompt,
+            previous_text=previous_text,
+            merge_prompt=merge_prompt,
+            reduce_prompt=reduce_prompt,
+            # Concurrent sends to the agent itself would interleave in its history.
+            max_concurrency=max_concurrency if target_agent is not ctx.agent else 1,
+        ),
+        details,
     )
+    if cache is not None:
+        summary = _store_summary(cache, cache_key, summary)
 
-    ctx.load_message_history([summary_message, *recent])
-    show_hook_message(
+    # Sending to the agent itself in the background would interleave with its turn.
+    if background and target_agent is not ctx.agent:
+        task = asyncio.create_task(summary)
+        details["reason"] = reason
+        state.pending = _PendingSummary(
+            task=task,
+            covered=boundary,
+            covered_digest=_tail_digest(history, boundary),
+            record=record,
+            details=details,
+        )
+        show_hook_message(
+            ctx,
+            "started background compaction",
+            hook_name="compaction_prompt",
+            hook_kind="tool",
+        )
+        return
+
+    _install_summary(
         ctx,
+        state,
+        await summary,
+        recent,
         "compacted history with summary prompt",
-        hook_name="compaction_prompt",
-        hook_kind="tool",
+        record=record,
+        reason=reason,
+        **details,
     )
+
+
+def _apply_pending_summary(ctx: HookContext, state: _HistoryState) -> None:
+    pending = state.pending
+    state.pending = None
+    if pending is None or pending.task.cancelled():
+        return
+    error = pending.task.exception()
+    if error is not None:
+        show_hook_failure(ctx, hook_name="compaction_prompt", hook_kind="tool", error=error)
+        return
+
+    history = ctx.message_history
+    boundary = pending.covered
+    if boundary > len(history) or _tail_digest(history, boundary) != pending.covered_digest:
+        # History was replaced while summarising; the summary no longer lines up.
+        show_hook_message(
+            ctx,
+            "discarded background summary: history changed while summarising",
+            hook_name="compaction_prompt",
+            hook_kind="tool",
+        )
+        return
+
+    details = dict(pending.details)
+    reason = str(details.pop("reason", "background summary ready"))
+    _install_summary(
+        ctx,
+        state,
+        pending.task.result(),
+        history[boundary:],
+        "compacted history with background summary",
+        # Started with the hook run, so duration_ms covers the summarisation too.
+        record=pending.record,
+        reason=reason,
+        background=True,
+        **details,
+    )
+
+
+async def apply_pending_compaction(ctx: HookContext) -> None:
+    """Swap in a finished background summary; keeps the full history until it is ready."""
+    state = _state_for(ctx)
+    if state.pending is None or not state.pending.task.done():
+        return
+    _apply_pending_summary(ctx, state)
+
+
+async def fetch_spilled_result(key: str) -> str:
+    """Return the full text of a tool result that compaction spilled to disk."""
+    try:
+        result = SpillStore.get(key)
+    except (OSError, ValueError) as exc:
+        return f"Error: {exc}"
+    text = _tool_result_text(result) or "(empty tool result)"
+    return f"Error result:\n{text}" if result.is_error else text
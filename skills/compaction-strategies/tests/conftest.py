@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The hooks are loaded by path from agent cards; make them importable the same way.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
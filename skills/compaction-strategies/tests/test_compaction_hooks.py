@@ -0,0 +1,460 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fast_agent")
+
+from mcp.types import (  # noqa: E402
+    CallToolRequest,
+    CallToolRequestParams,
+    CallToolResult,
+    TextContent,
+)
+
+from fast_agent.agents.agent_types import AgentConfig  # noqa: E402
+from fast_agent.agents.llm_agent import LlmAgent  # noqa: E402
+from fast_agent.hooks.hook_context import HookContext  # noqa: E402
+from fast_agent.mcp.helpers.content_helpers import get_text  # noqa: E402
+from fast_agent.types import LlmStopReason, PromptMessageExtended  # noqa: E402
+
+import compaction_hooks  # noqa: E402
+
+
+@dataclass
+class _Runner:
+    delta_messages: list[PromptMessageExtended] = field(default_factory=list)
+    iteration: int = 0
+    request_params: None = None
+
+
+def _text(role: str, text: str, **kwargs: object) -> PromptMessageExtended:
+    return PromptMessageExtended(
+        role=role,
+        content=[TextContent(type="text", text=text)],
+        **kwargs,
+    )
+
+
+def _tool_turn(index: int, payload: str, *, is_error: bool = False) -> list[PromptMessageExtended]:
+    """User question, tool call, tool result, final answer."""
+    tool_id = f"call_{index}"
+    call = CallToolRequest(
+        method="tools/call",
+        params=CallToolRequestParams(name="read_file", arguments={"path": f"src/m{index}.py"}),
+    )
+    result = CallToolResult(content=[TextContent(type="text", text=payload)], is_error=is_error)
+    return [
+        _text("user", f"Question {index}: explain src/m{index}.py"),
+        _text(
+            "assistant",
+            "Reading the file.",
+            tool_calls={tool_id: call},
+            stop_reason=LlmStopReason.TOOL_USE,
+        ),
+        PromptMessageExtended(role="user", content=[], tool_results={tool_id: result}),
+        _text("assistant", f"m{index}.py defines a helper.", stop_reason=LlmStopReason.END_TURN),
+    ]
+
+
+def _tool_history(turns: int, payload_chars: int = 2000) -> list[PromptMessageExtended]:
+    history: list[PromptMessageExtended] = []
+    for index in range(turns):
+        history.extend(_tool_turn(index, f"line {index}: " + "x" * payload_chars))
+    return history
+
+
+def _context(
+    history: list[PromptMessageExtended], **agents: object
+) -> tuple[HookContext, LlmAgent]:
+    agent = LlmAgent(AgentConfig(name="compaction-test"))
+    agent.load_message_history(history)
+    agent.set_agent_registry({agent.name: agent, **agents})
+    ctx = HookContext(
+        runner=_Runner(delta_messages=list(history)),
+        agent=agent,
+        message=history[-1],
+        hook_type="after_turn_complete",
+    )
+    return ctx, agent
+
+
+def _result_texts(history: list[PromptMessageExtended]) -> list[str]:
+    return [
+        get_text(result.content[0]) or ""
+        for msg in history
+        for result in (msg.tool_results or {}).values()
+    ]
+
+
+def test_ledger_recounts_history_replaced_in_the_middle() -> None:
+    history = [_text("user", "question"), _text("assistant", "short"), _text("user", "next")]
+    ledger = compaction_hooks.TokenLedger()
+    ledger.sync(history)
+
+    replaced = [history[0], _text("assistant", "long answer " * 200), history[2]]
+
+    assert ledger.sync(replaced) == compaction_hooks._estimate_tokens(replaced)
+
+
+def test_ledger_counts_appended_messages_once() -> None:
+    history = [_text("user", "question"), _text("assistant", "answer")]
+    ledger = compaction_hooks.TokenLedger()
+    ledger.sync(history)
+
+    extended = [*history, _text("user", "follow up " * 50)]
+
+    assert ledger.sync(extended) == compaction_hooks._estimate_tokens(extended)
+
+
+def test_configure_tokenizer_keeps_agent_state() -> None:
+    class Agent:
+        pass
+
+    agent = Agent()
+    state = compaction_hooks._HistoryState(summary=_text("assistant", "summary"))
+    state.ledger.sync([_text("user", "question " * 40)])
+    compaction_hooks._history_state[agent] = state
+    try:
+        compaction_hooks.configure_tokenizer(compaction_hooks.HeuristicTokenizer())
+        assert compaction_hooks._history_state[agent] is state
+        assert state.summary is not None
+        assert state.ledger.total == 0
+    finally:
+        compaction_hooks.configure_tokenizer(None)
+        del compaction_hooks._history_state[agent]
+
+
+def test_clear_results_soft_strips_tool_results_once() -> None:
+    history = _tool_history(3)
+    history[2].tool_results["call_0"].is_error = True
+    ctx, agent = _context(history)
+    stored = agent.message_history
+
+    asyncio.run(compaction_hooks.clear_results_soft(ctx))
+
+    # The stored messages are edited in place; the history is not reloaded.
+    assert agent.message_history is stored
+    assert _result_texts(agent.message_history) == [compaction_hooks.DEFAULT_OMITTED_TEXT] * 3
+    assert compaction_hooks._state_for(ctx).ledger.total == (
+        compaction_hooks._estimate_tokens(agent.message_history)
+    )
+    assert agent.message_history[2].tool_results["call_0"].is_error
+    stripped = agent.message_history
+    asyncio.run(compaction_hooks.clear_results_soft(ctx))
+    assert all(new is old for new, old in zip(agent.message_history, stripped))
+
+
+def test_chunks_sent_to_the_agent_itself_go_one_at_a_time() -> None:
+    history = _tool_history(10)
+    ctx, agent = _context(history)
+    in_flight = 0
+    peak = 0
+
+    async def send(message: str) -> str:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return "summary"
+
+    agent.send = send  # type: ignore[method-assign]
+    asyncio.run(compaction_hooks.compaction_prompt(ctx, chunk_tokens=1000))
+
+    assert peak == 1
+    assert agent.message_history[0].all_text() == "summary"
+
+
+def test_failed_chunk_cancels_the_other_chunk_requests() -> None:
+    cancelled: list[str] = []
+
+    async def send(message: str) -> str:
+        if "chunk 0" in message:
+            raise RuntimeError("compactor failed")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(message)
+            raise
+        return "partial"
+
+    async def run() -> None:
+        with pytest.raises(RuntimeError, match="compactor failed"):
+            await compaction_hooks._request_summary(
+                send,
+                ["chunk 0", "chunk 1", "chunk 2"],
+                prompt="summarize",
+                previous_text=None,
+                merge_prompt="merge",
+                reduce_prompt="reduce",
+                max_concurrency=4,
+            )
+        await asyncio.sleep(0)
+        # Still inside the loop: asyncio.run would cancel leftovers on its own.
+        assert len(cancelled) == 2
+
+    asyncio.run(run())
+
+
+def test_evict_tool_results_evicts_old_results_until_under_budget() -> None:
+    history = _tool_history(6)
+    ctx, agent = _context(history)
+
+    asyncio.run(compaction_hooks.evict_tool_results(ctx, target_tokens=2000, keep_turns=2))
+
+    texts = _result_texts(agent.message_history)
+    assert compaction_hooks.DEFAULT_OMITTED_TEXT in texts
+    # The last two turns are never evicted.
+    assert texts[-2:] == _result_texts(history)[-2:]
+    assert compaction_hooks._estimate_tokens(agent.message_history) <= 2000
+
+    evicted = agent.message_history
+    asyncio.run(compaction_hooks.evict_tool_results(ctx, target_tokens=2000, keep_turns=2))
+    assert agent.message_history == evicted
+
+
+def test_dedupe_tool_results_replaces_earlier_copies() -> None:
+    payload = "same file contents\n" * 40
+    history = [*_tool_turn(0, payload, is_error=True), *_tool_turn(1, payload)]
+    ctx, agent = _context(history)
+
+    asyncio.run(compaction_hooks.dedupe_tool_results(ctx))
+
+    first, second = (
+        result for msg in agent.message_history for result in (msg.tool_results or {}).values()
+    )
+    assert get_text(first.content[0]) == "(same as tool result call_1)"
+    assert first.is_error
+    assert get_text(second.content[0]) == payload
+
+
+def test_spilled_results_can_be_fetched_back(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv(compaction_hooks.SPILL_DIR_ENV, str(tmp_path))
+    history = [*_tool_turn(0, "payload zero", is_error=True), *_tool_turn(1, "payload one")]
+    ctx, agent = _context(history)
+
+    asyncio.run(compaction_hooks.clear_results_soft(ctx, spill=True))
+
+    keys = [text.rsplit(" ", 1)[-1].rstrip(")") for text in _result_texts(agent.message_history)]
+    fetched = [asyncio.run(compaction_hooks.fetch_spilled_result(key)) for key in keys]
+    assert fetched == ["Error result:\npayload zero", "payload one"]
+
+
+def test_spill_store_lives_in_the_session_directory(tmp_path, monkeypatch) -> None:
+    monkeypatch.delenv(compaction_hooks.SPILL_DIR_ENV, raising=False)
+    store = compaction_hooks.SpillStore.for_session(tmp_path / "session")
+
+    key = store.put(CallToolResult(content=[TextContent(type="text", text="payload")]))
+
+    assert store.directory == tmp_path / "session" / "spill"
+    assert get_text(compaction_hooks.SpillStore.get(key).content[0]) == "payload"
+
+
+def test_summary_cache_follows_the_current_session(tmp_path, monkeypatch) -> None:
+    monkeypatch.delenv(compaction_hooks.SUMMARY_CACHE_DIR_ENV, raising=False)
+    session = SimpleNamespace(directory=str(tmp_path / "first"))
+    manager = SimpleNamespace(current_session=session)
+    agent = SimpleNamespace(context=SimpleNamespace(session_manager=manager))
+    ctx = HookContext(runner=_Runner(), agent=agent, message=None, hook_type="after_turn_complete")
+
+    first = compaction_hooks._summary_cache_for(ctx)
+    session.directory = str(tmp_path / "second")
+
+    assert first.directory == tmp_path / "first" / "compaction-cache"
+    assert compaction_hooks._summary_cache_for(ctx).directory == (
+        tmp_path / "second" / "compaction-cache"
+    )
+    monkeypatch.setenv(compaction_hooks.SUMMARY_CACHE_DIR_ENV, str(tmp_path / "env"))
+    assert compaction_hooks._summary_cache_for(ctx).directory == tmp_path / "env"
+
+
+def test_spill_store_removes_oldest_segments_over_max_bytes(tmp_path) -> None:
+    store = compaction_hooks.SpillStore(tmp_path, max_bytes=4000)
+    result = CallToolResult(content=[TextContent(type="text", text="x" * 500)])
+
+    keys = [store.put(result) for _ in range(40)]
+
+    # The cap, plus the open segment (a quarter of the cap and one more payload).
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.spill")) <= 4000 + 1000 + 600
+    with pytest.raises(ValueError, match="no longer available"):
+        compaction_hooks.SpillStore.get(keys[0])
+    assert get_text(compaction_hooks.SpillStore.get(keys[-1]).content[0]) == "x" * 500
+
+
+class _Compactor:
+    name = "compactor"
+
+    def __init__(self) -> None:
+        self.messages: list[str] = []
+
+    async def send(self, message: str) -> str:
+        self.messages.append(message)
+        return "summary of earlier turns"
+
+
+def test_compaction_prompt_summarizes_history_with_tool_results() -> None:
+    history = _tool_history(8, payload_chars=6000)
+    compactor = _Compactor()
+    ctx, agent = _context(history, compactor=compactor)
+
+    asyncio.run(compaction_hooks.compaction_prompt(ctx, compactor_agent="compactor"))
+
+    assert agent.message_history[0].all_text() == "summary of earlier turns"
+    assert [m.all_text() for m in agent.message_history[1:]] == [m.all_text() for m in history[-8:]]
+    # Tool results are cut to a bounded excerpt by default.
+    assert "x" * 6000 not in compactor.messages[0]
+    assert "characters omitted" in compactor.messages[0]
+
+
+def test_transcript_budget_keeps_the_newest_turns() -> None:
+    history = _tool_history(8, payload_chars=1000)
+    compactor = _Compactor()
+    ctx, _ = _context(history, compactor=compactor)
+
+    asyncio.run(
+        compaction_hooks.compaction_prompt(
+            ctx, compactor_agent="compactor", transcript_tokens=1000
+        )
+    )
+
+    transcript = compactor.messages[0]
+    assert compaction_hooks.TRANSCRIPT_TRUNCATED_TEXT in transcript
+    assert "Question 0:" not in transcript
+    # The last summarised turn (before the two kept ones) is always in the transcript.
+    assert "m5.py defines a helper." in transcript
+
+
+def test_compaction_prompt_skips_results_cleared_with_a_custom_placeholder() -> None:
+    history = _tool_history(8)
+    ctx, agent = _context(history, compactor=_Compactor())
+    asyncio.run(compaction_hooks.clear_results_soft(ctx, placeholder="[dropped]"))
+    compactor = _Compactor()
+    ctx, _ = _context(agent.message_history, compactor=compactor)
+
+    asyncio.run(
+        compaction_hooks.compaction_prompt(
+            ctx, compactor_agent="compactor", placeholder="[dropped]"
+        )
+    )
+
+    assert "TOOL_RESULT" not in compactor.messages[0]
+
+
+def test_cache_aware_window_keeps_the_template_prefix() -> None:
+    templates = [
+        _text("user", "You review pull requests.", is_template=True),
+        _text("assistant", "Understood.", is_template=True),
+    ]
+    history = [*templates, *_tool_history(20, payload_chars=100)]
+    ctx, agent = _context(history)
+
+    asyncio.run(compaction_hooks.cache_aware_window(ctx, max_turns=16, keep_turns=8))
+
+    trimmed = agent.message_history
+    assert [msg.all_text() for msg in trimmed[:2]] == [msg.all_text() for msg in templates]
+    assert [msg.all_text() for msg in trimmed[2:]] == [msg.all_text() for msg in history[-32:]]
+
+
+def test_background_compaction_times_the_summarisation() -> None:
+    class SlowCompactor(_Compactor):
+        async def send(self, message: str) -> str:
+            await asyncio.sleep(0.2)
+            return await super().send(message)
+
+    history = _tool_history(8)
+    ctx, agent = _context(history, compactor=SlowCompactor())
+
+    async def run() -> None:
+        await compaction_hooks.compaction_prompt(ctx, compactor_agent="compactor", background=True)
+        await compaction_hooks._state_for(ctx).pending.task
+        await compaction_hooks.apply_pending_compaction(ctx)
+
+    asyncio.run(run())
+
+    blocks = agent.message_history[-1].channels[compaction_hooks.FAST_AGENT_COMPACTION]
+    payload = json.loads(get_text(blocks[-1]))
+    assert payload["background"] is True
+    assert payload["duration_ms"] >= 200
+    assert agent.message_history[0].all_text() == "summary of earlier turns"
+
+
+def test_background_summary_survives_a_reloaded_history() -> None:
+    history = _tool_history(8)
+    ctx, agent = _context(history, compactor=_Compactor())
+
+    async def run() -> None:
+        await compaction_hooks.compaction_prompt(ctx, compactor_agent="compactor", background=True)
+        await compaction_hooks._state_for(ctx).pending.task
+        # Clearing results reloads nothing, but a plain reload deep-copies every message.
+        await compaction_hooks.clear_results_soft(ctx)
+        agent.load_message_history(agent.message_history)
+        await compaction_hooks.apply_pending_compaction(ctx)
+
+    asyncio.run(run())
+
+    assert agent.message_history[0].all_text() == "summary of earlier turns"
+    assert [m.all_text() for m in agent.message_history[1:]] == [m.all_text() for m in history[-8:]]
+
+
+def test_background_summary_is_dropped_when_history_was_trimmed() -> None:
+    history = _tool_history(8)
+    ctx, agent = _context(history, compactor=_Compactor())
+
+    async def run() -> None:
+        await compaction_hooks.compaction_prompt(ctx, compactor_agent="compactor", background=True)
+        await compaction_hooks._state_for(ctx).pending.task
+        agent.load_message_history(agent.message_history[4:])
+        await compaction_hooks.apply_pending_compaction(ctx)
+
+    asyncio.run(run())
+
+    assert compaction_hooks._state_for(ctx).pending is None
+    assert [m.all_text() for m in agent.message_history] == [m.all_text() for m in history[4:]]
+
+
+def test_load_history_tracks_the_stored_copies() -> None:
+    ctx, agent = _context(_tool_history(3))
+
+    asyncio.run(compaction_hooks.clear_results_soft(ctx))
+    agent.append_history(_tool_turn(3, "fresh payload"))
+
+    history = ctx.message_history
+    state = compaction_hooks._state_for(ctx)
+    # Only the appended turn is new to the watermark and the ledger.
+    assert state.watermark("clear_results_soft").start(history) == 12
+    assert compaction_hooks._appended_from(state.ledger._messages, history) == 12
+
+
+@pytest.mark.parametrize(
+    "strategy",
+    [
+        "rolling_window",
+        "truncate_over_threshold",
+        "cache_aware_window",
+        "clear_results_soft",
+        "clear_results_hard",
+        "evict_tool_results",
+        "dedupe_tool_results",
+        "compaction_prompt",
+    ],
+)
+def test_every_strategy_runs_over_tool_results(strategy: str) -> None:
+    history = _tool_history(40)
+    ctx, agent = _context(history, compactor=_Compactor())
+    hook = getattr(compaction_hooks, strategy)
+    kwargs = {"compactor_agent": "compactor"} if strategy == "compaction_prompt" else {}
+
+    asyncio.run(hook(ctx, **kwargs))
+    agent.append_history(_tool_turn(40, "y" * 2000))
+    ctx.message = agent.message_history[-1]
+    asyncio.run(hook(ctx, **kwargs))
+
+    assert agent.message_history
+    assert compaction_hooks._estimate_tokens(agent.message_history) <= (
+        compaction_hooks._estimate_tokens([*history, *_tool_turn(40, "y" * 2000)])
+    )
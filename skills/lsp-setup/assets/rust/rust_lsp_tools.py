@@ -3,13 +3,31 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import heapq
 import json
 import os
+import re
 import subprocess
+import sys
+import tempfile
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from pathlib import Path
 from shutil import which
-from typing import Any, Awaitable, Callable, TypeVar
-from urllib.parse import urlparse
+from typing import Any, Awaitable, Callable, Iterator, TypeVar
+from urllib.parse import unquote, urlparse
+
+try:  # Optional: faster JSON encoding/decoding for large responses.
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:  # Optional: watch the allowed paths so any edit invalidates cached responses.
+    import watchfiles
+except ImportError:  # pragma: no cover - optional dependency
+    watchfiles = None
 
 # REQUIRED: Adjust parents[] if the card is not stored at .fast-agent/agent-cards/.
 _REPO_ROOT = Path(__file__).resolve().parents[2]
@@ -24,6 +42,83 @@ _server: "RustAnalyzerClient | None" = None
 
 _CONTENT_MODIFIED_RETRY_ATTEMPTS = 2
 _CONTENT_MODIFIED_BASE_DELAY_SECONDS = 0.05
+# Upper bound on lsp_batch operations in flight on the one server connection.
+_BATCH_MAX_CONCURRENCY = 8
+# Identical queries in flight at the same time (parallel tool calls) share one request
+# and its retries. Counts of requests sent vs. calls that joined one already in flight.
+_inflight: dict[tuple[Any, ...], asyncio.Future[Any]] = {}
+_request_counts = {"issued": 0, "coalesced": 0}
+
+# Navigation responses are cached per query and reused until any source file under the
+# allowed paths changes: a watcher bumps _workspace_generation on every change (without
+# watchfiles, a stat fingerprint of the source files is compared instead, recomputed at
+# most once per _STAT_STAMP_TTL_SECONDS). The source file and every file in the result
+# must also keep the same mtime and size, which covers edits the watcher (or the
+# fingerprint) has not reported yet. The stamp is taken before the server is asked, so an
+# edit made while a request is in flight invalidates its answer.
+_RESPONSE_CACHE_MAX_ENTRIES = 512
+_response_cache: OrderedDict[
+    tuple[Any, ...], tuple[Any, tuple[tuple[str, tuple[int, int]], ...], str]
+] = OrderedDict()
+_workspace_generation = 0
+_workspace_watch_task: "asyncio.Task[None] | None" = None
+_STAT_STAMP_TTL_SECONDS = 1.0
+_stat_stamp: tuple[float, Any] | None = None
+
+# Bytes requested from rust-analyzer's stdout per read while framing messages.
+_READ_CHUNK_SIZE = 256 * 1024
+
+# How long lsp_diagnostics waits for rust-analyzer to publish for an edited file.
+_DIAGNOSTICS_TIMEOUT_SECONDS = 5.0
+
+# Queries wait for indexing to finish ($/progress, experimental/serverStatus), but only
+# until this long after the server starts; later re-indexing does not hold them up past
+# that deadline.
+_READY_TIMEOUT_SECONDS = 30.0
+# Until the first serverStatus arrives, queries wait at most this long after initialized
+# for it, and a created progress token (window/workDoneProgress/create) holds them at
+# most this long for its begin.
+_READY_GRACE_SECONDS = 1.0
+
+# Set FAST_AGENT_LSP_WARMUP=1 to start rust-analyzer when the module is imported inside
+# a running event loop and open the most recently modified files under _ALLOWED_DIRS.
+_WARMUP_ENV = "FAST_AGENT_LSP_WARMUP"
+_WARMUP_MAX_FILES = 8
+_WARMUP_SCAN_LIMIT = 20000
+_WARMUP_SUFFIXES = {".rs"}
+_WARMUP_SKIP_DIRS = {"target", "node_modules"}
+_warmup_task: "asyncio.Task[None] | None" = None
+
+# A request rust-analyzer has not answered by then is cancelled ($/cancelRequest) and
+# fails; after this many timeouts in a row the server is treated as hung and restarted.
+_REQUEST_TIMEOUT_SECONDS = 30.0
+_RESTART_AFTER_TIMEOUTS = 3
+
+# Open documents not queried for this long are closed (didClose) to bound memory.
+_IDLE_CLOSE_SECONDS = 300.0
+
+# lsp_workspace_symbols answers from a persistent index of documentSymbol results for
+# the files under the allowed paths, refreshed in the background (stat, then content
+# hash) for changed files only; the server is asked only when the index has no match.
+_SYMBOL_INDEX_PATH = _REPO_ROOT / ".fast-agent" / "lsp-index" / "rust.json"
+_SYMBOL_INDEX_VERSION = 1
+_SYMBOL_INDEX_REFRESH_SECONDS = 60.0
+_SYMBOL_INDEX_CONCURRENCY = 4
+_SYMBOL_SEARCH_LIMIT = 100
+_symbol_index: "_SymbolIndex | None" = None
+_symbol_index_task: "asyncio.Task[None] | None" = None
+
+# Set FAST_AGENT_LSP_DAEMON=1 to share one language server per repo root between
+# processes: the tools forward calls to a daemon (started on demand) over a Unix socket.
+_DAEMON_ENV = "FAST_AGENT_LSP_DAEMON"
+_DAEMON_IDLE_SECONDS = 1800.0
+_DAEMON_START_TIMEOUT_SECONDS = 10.0
+# Covers the daemon's readiness wait plus one request with its retries.
+_DAEMON_CALL_TIMEOUT_SECONDS = 120.0
+_DAEMON_STREAM_LIMIT = 64 * 1024 * 1024
+_daemon_lock = asyncio.Lock()
+_daemon_client: "_DaemonClient | None" = None
+_daemon_serving = False
 
 _ReturnT = TypeVar("_ReturnT")
 
@@ -114,7 +209,7 @@ def _uri_to_relative(uri: str | None) -> str:
         return ""
     if uri.startswith("file:"):
         parsed = urlparse(uri)
-        path = Path(parsed.path)
+        path = Path(unquote(parsed.path))
         try:
             return str(path.relative_to(_REPO_ROOT))
         except ValueError:
@@ -122,6 +217,183 @@ def _uri_to_relative(uri: str | None) -> str:
     return uri
 
 
+def _file_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _location_paths(locations: list[dict[str, Any]]) -> list[str]:
+    paths: list[str] = []
+    for location in locations:
+        path = (
+            location.get("absolutePath")
+            or location.get("relativePath")
+            or _uri_to_relative(location.get("uri") or location.get("targetUri"))
+        )
+        if path:
+            paths.append(path)
+    return paths
+
+
+def _is_watched_source(change: Any, path: str) -> bool:
+    try:
+        relative_path = Path(path).relative_to(_REPO_ROOT)
+    except ValueError:
+        return False
+    return (
+        relative_path.suffix in _WARMUP_SUFFIXES
+        and _path_is_allowed(relative_path)
+        and not any(
+            part.startswith(".") or part in _WARMUP_SKIP_DIRS for part in relative_path.parts
+        )
+    )
+
+
+async def _watch_workspace() -> None:
+    global _workspace_generation
+    assert watchfiles is not None
+    if _allow_all_paths():
+        roots = [_REPO_ROOT]
+    else:
+        names = sorted({*_ALLOWED_DIRS, *_ALLOWED_FILES})
+        roots = [_REPO_ROOT / name for name in names if (_REPO_ROOT / name).exists()]
+    if not roots:
+        return
+    async for _ in watchfiles.awatch(
+        *roots, watch_filter=_is_watched_source, debounce=200, step=20
+    ):
+        _workspace_generation += 1
+
+
+def _workspace_stamp() -> Any:
+    """Return a value that changes whenever a source file under the allowed paths does."""
+    global _workspace_generation, _workspace_watch_task, _stat_stamp
+    try:
+        loop: asyncio.AbstractEventLoop | None = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    task = _workspace_watch_task
+    restart = task is None or task.get_loop() is not loop
+    if watchfiles is not None and loop is not None and restart:
+        # Anything cached before this watcher started (or under another loop) may be stale.
+        _workspace_generation += 1
+        task = _workspace_watch_task = loop.create_task(_watch_workspace())
+        task.add_done_callback(lambda done: None if done.cancelled() else done.exception())
+    if task is not None and not task.done() and task.get_loop() is loop:
+        return ("watch", _workspace_generation)
+    # Without a watcher every query would walk and stat the whole tree; reuse a recent walk.
+    now = time.monotonic()
+    if _stat_stamp is not None and now - _stat_stamp[0] < _STAT_STAMP_TTL_SECONDS:
+        return _stat_stamp[1]
+    stamp = ("stat", hash(tuple((str(path), _file_stamp(path)) for path in _source_files())))
+    _stat_stamp = (now, stamp)
+    return stamp
+
+
+def _cache_lookup(key: tuple[Any, ...], workspace: Any) -> str | None:
+    """Return a cached response if no source file changed since it was stored.
+
+    ``workspace`` is the current ``_workspace_stamp()``.
+    """
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    stored, stamps, text = entry
+    if stored != workspace or any(
+        _file_stamp(Path(path)) != stamp for path, stamp in stamps
+    ):
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return text
+
+
+def _cache_store(key: tuple[Any, ...], workspace: Any, text: str, paths: list[str]) -> str:
+    """Cache ``text`` against ``workspace`` and the stat of ``paths``; return it.
+
+    ``workspace`` must be the stamp taken before the request was sent.
+    """
+    stamps: list[tuple[str, tuple[int, int]]] = []
+    for path in dict.fromkeys(paths):
+        absolute_path = str(_REPO_ROOT / path)
+        stamp = _file_stamp(Path(absolute_path))
+        if stamp is None:
+            return text
+        stamps.append((absolute_path, stamp))
+    _response_cache[key] = (workspace, tuple(stamps), text)
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > _RESPONSE_CACHE_MAX_ENTRIES:
+        _response_cache.popitem(last=False)
+    return text
+
+
+_LINE_PATTERN = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+")
+
+# LSP TextDocumentSyncKind values.
+_SYNC_FULL = 1
+_SYNC_INCREMENTAL = 2
+
+
+def _utf16_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _text_document_sync_kind(initialize_result: Any) -> int:
+    capabilities = (initialize_result or {}).get("capabilities", {})
+    sync = capabilities.get("textDocumentSync")
+    if isinstance(sync, dict):
+        sync = sync.get("change")
+    return sync if isinstance(sync, int) else _SYNC_FULL
+
+
+def _incremental_change(previous: str, text: str) -> dict[str, Any]:
+    """One ranged change covering the lines between the common prefix and suffix."""
+    old_lines = _LINE_PATTERN.findall(previous)
+    new_lines = _LINE_PATTERN.findall(text)
+    start = 0
+    limit = min(len(old_lines), len(new_lines))
+    while start < limit and old_lines[start] == new_lines[start]:
+        start += 1
+    old_end = len(old_lines)
+    new_end = len(new_lines)
+    while old_end > start and new_end > start and old_lines[old_end - 1] == new_lines[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+
+    if old_end == len(old_lines) and old_lines and not old_lines[-1].endswith(("\n", "\r")):
+        # The old text has no trailing line break; end at the last character instead.
+        end = {"line": old_end - 1, "character": _utf16_length(old_lines[-1])}
+    else:
+        end = {"line": old_end, "character": 0}
+    return {
+        "range": {"start": {"line": start, "character": 0}, "end": end},
+        "text": "".join(new_lines[start:new_end]),
+    }
+
+
+def _json_dumps(message: dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(message)
+    return json.dumps(message).encode("utf-8")
+
+
+def _json_loads(payload: memoryview) -> Any:
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(str(payload, "utf-8"))
+
+
+def _content_length(header: bytes | bytearray) -> int:
+    for line in header.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            return int(value)
+    raise RuntimeError("Missing Content-Length header from rust-analyzer response.")
+
+
 def _format_range(range_data: dict[str, Any] | None) -> str:
     if not range_data:
         return ""
@@ -253,6 +525,36 @@ async def _retry_on_content_modified(operation: Callable[[], Awaitable[_ReturnT]
     raise RuntimeError("Retry loop exhausted unexpectedly.")
 
 
+async def _single_flight(
+    key: tuple[Any, ...], operation: Callable[[], Awaitable[_ReturnT]]
+) -> _ReturnT:
+    """Run ``operation`` once per key at a time; concurrent callers share its result."""
+    task = _inflight.get(key)
+    if task is not None:
+        _request_counts["coalesced"] += 1
+    else:
+        _request_counts["issued"] += 1
+        task = asyncio.ensure_future(operation())
+        _inflight[key] = task
+
+        def forget(done: asyncio.Future[Any]) -> None:
+            if _inflight.get(key) is done:
+                del _inflight[key]
+            if not done.cancelled():
+                done.exception()  # Retrieved here too, in case every caller was cancelled.
+
+        task.add_done_callback(forget)
+    # Shielded: one caller being cancelled must not cancel the request for the others.
+    return await asyncio.shield(task)
+
+
+async def _coalesced_request(
+    key: tuple[Any, ...], operation: Callable[[], Awaitable[_ReturnT]]
+) -> _ReturnT:
+    """Send a request with ContentModified retries, shared by identical concurrent queries."""
+    return await _single_flight(key, lambda: _retry_on_content_modified(operation))
+
+
 class RustAnalyzerClient:
     """Tiny stdio JSON-RPC client for rust-analyzer."""
 
@@ -262,11 +564,28 @@ class RustAnalyzerClient:
         self._reader_task: asyncio.Task[None] | None = None
         self._stderr_task: asyncio.Task[None] | None = None
         self._write_lock = asyncio.Lock()
+        # Serialises didOpen/didChange so concurrent queries see a consistent version.
+        self._sync_lock = asyncio.Lock()
         self._next_id = 1
         self._pending: dict[int, asyncio.Future[Any]] = {}
+        self._buffer = bytearray()
         self._diagnostics: dict[str, list[dict[str, Any]]] = {}
+        # URIs opened or changed since their last publishDiagnostics, and their waiters.
+        self._stale_diagnostics: set[str] = set()
+        self._diagnostic_waiters: dict[str, list[asyncio.Future[None]]] = {}
         self._versions: dict[str, int] = {}
         self._texts: dict[str, str] = {}
+        self._stamps: dict[str, tuple[int, int] | None] = {}
+        self._last_used: dict[str, float] = {}
+        self._sync_kind = _SYNC_FULL
+        # Indexing state: active $/progress tokens and serverStatus quiescence.
+        self._progress_tokens: set[Any] = set()
+        self._created_tokens: set[Any] = set()
+        self._quiescent: bool | None = None
+        self._grace_over = False
+        self._ready = asyncio.Event()
+        self._ready_deadline = time.monotonic() + _READY_TIMEOUT_SECONDS
+        self._consecutive_timeouts = 0
 
     async def start(self) -> None:
         if self.process is not None:
@@ -284,7 +603,7 @@ class RustAnalyzerClient:
         self._stderr_task = asyncio.create_task(self._stderr_drain_loop())
 
         root_uri = self.repo_root.as_uri()
-        await self.request(
+        initialize_result = await self.request(
             "initialize",
             {
                 "processId": os.getpid(),
@@ -294,12 +613,71 @@ class RustAnalyzerClient:
                 "capabilities": {
                     "workspace": {"workspaceFolders": True},
                     "textDocument": {"hover": {"contentFormat": ["markdown", "plaintext"]}},
+                    "window": {"workDoneProgress": True},
+                    "experimental": {"serverStatusNotification": True},
                 },
             },
         )
+        self._sync_kind = _text_document_sync_kind(initialize_result)
         await self.notify("initialized", {})
+        self._ready_deadline = time.monotonic() + _READY_TIMEOUT_SECONDS
+        asyncio.get_running_loop().call_later(_READY_GRACE_SECONDS, self._end_grace)
+
+    @property
+    def ready(self) -> bool:
+        """Whether rust-analyzer has finished indexing."""
+        return self._ready.is_set()
+
+    async def wait_until_ready(self, timeout: float | None = None) -> bool:
+        """Wait for indexing to finish, at most until the readiness deadline or timeout."""
+        if not self._ready.is_set():
+            remaining = self._ready_deadline - time.monotonic()
+            if timeout is not None:
+                remaining = min(remaining, timeout)
+            if remaining > 0:
+                try:
+                    await asyncio.wait_for(self._ready.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        return self._ready.is_set()
+
+    @property
+    def alive(self) -> bool:
+        """Whether the process is running, its output is being read, and it is not hung."""
+        return (
+            self.process is not None
+            and self.process.returncode is None
+            and self._reader_task is not None
+            and not self._reader_task.done()
+            and self._consecutive_timeouts < _RESTART_AFTER_TIMEOUTS
+        )
 
-    async def request(self, method: str, params: Any) -> Any:
+    async def stop(self) -> None:
+        """Kill the process if it is still running and fail everything waiting on it."""
+        for task in (self._reader_task, self._stderr_task):
+            if task is not None:
+                task.cancel()
+        if self.process is not None and self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+            await self.process.wait()
+        self._fail_pending(RuntimeError("rust-analyzer was stopped."))
+
+    async def reopen_documents(self, previous: RustAnalyzerClient) -> None:
+        """Open the documents a crashed client had open (didOpen with the current text)."""
+        for uri in list(previous._texts):
+            try:
+                await self.sync_document(_uri_to_relative(uri))
+            except (OSError, ValueError):
+                continue  # Deleted, unreadable or no longer UTF-8; the next query reports it.
+
+    async def request(
+        self, method: str, params: Any, timeout: float = _REQUEST_TIMEOUT_SECONDS
+    ) -> Any:
+        if self._reader_task is not None and self._reader_task.done():
+            raise RuntimeError("rust-analyzer is not running.")
         request_id = self._next_id
         self._next_id += 1
 
@@ -307,15 +685,27 @@ class RustAnalyzerClient:
         future: asyncio.Future[Any] = loop.create_future()
         self._pending[request_id] = future
 
-        await self._send(
-            {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "method": method,
-                "params": params,
-            }
-        )
-        return await future
+        try:
+            await self._send(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "method": method,
+                    "params": params,
+                }
+            )
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._consecutive_timeouts += 1
+            try:
+                await self.notify("$/cancelRequest", {"id": request_id})
+            except (OSError, RuntimeError):
+                pass
+            raise RuntimeError(
+                f"rust-analyzer did not answer {method} within {timeout:g}s; request cancelled."
+            ) from None
+        finally:
+            self._pending.pop(request_id, None)
 
     async def notify(self, method: str, params: Any) -> None:
         await self._send(
@@ -327,14 +717,27 @@ class RustAnalyzerClient:
         )
 
     async def sync_document(self, relative_path: str) -> None:
+        async with self._sync_lock:
+            await self._sync_document(relative_path)
+
+    async def _sync_document(self, relative_path: str) -> None:
         absolute_path = (self.repo_root / relative_path).resolve()
         uri = absolute_path.as_uri()
+        self._last_used[uri] = time.monotonic()
+        await self._close_idle_documents()
+
+        # Unchanged mtime and size: the open document is current, skip the read.
+        stamp = _file_stamp(absolute_path)
+        if uri in self._texts and stamp is not None and self._stamps.get(uri) == stamp:
+            return
         text = absolute_path.read_text(encoding="utf-8")
+        self._stamps[uri] = stamp
 
         previous = self._texts.get(uri)
         if previous is None:
             self._texts[uri] = text
             self._versions[uri] = 1
+            self._stale_diagnostics.add(uri)
             await self.notify(
                 "textDocument/didOpen",
                 {
@@ -354,14 +757,33 @@ class RustAnalyzerClient:
         version = self._versions[uri] + 1
         self._texts[uri] = text
         self._versions[uri] = version
+        self._stale_diagnostics.add(uri)
+        if self._sync_kind == _SYNC_INCREMENTAL:
+            changes = [_incremental_change(previous, text)]
+        else:
+            changes = [{"text": text}]
         await self.notify(
             "textDocument/didChange",
             {
                 "textDocument": {"uri": uri, "version": version},
-                "contentChanges": [{"text": text}],
+                "contentChanges": changes,
             },
         )
 
+    async def _close_idle_documents(self) -> None:
+        cutoff = time.monotonic() - _IDLE_CLOSE_SECONDS
+        idle = [uri for uri, last_used in self._last_used.items() if last_used < cutoff]
+        for uri in idle:
+            await self._close_document(uri)
+
+    async def _close_document(self, uri: str) -> None:
+        self._last_used.pop(uri, None)
+        self._stamps.pop(uri, None)
+        self._versions.pop(uri, None)
+        self._stale_diagnostics.discard(uri)
+        if self._texts.pop(uri, None) is not None:
+            await self.notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+
     async def hover(self, relative_path: str, line: int, character: int) -> Any:
         await self.sync_document(relative_path)
         return await self.request(
@@ -393,17 +815,25 @@ class RustAnalyzerClient:
             },
         )
 
-    async def document_symbols(self, relative_path: str) -> Any:
+    async def document_symbols(self, relative_path: str, *, keep_open: bool = True) -> Any:
+        uri = _relative_path_to_uri(relative_path)
+        was_open = uri in self._texts
         await self.sync_document(relative_path)
-        return await self.request(
-            "textDocument/documentSymbol",
-            {"textDocument": {"uri": _relative_path_to_uri(relative_path)}},
-        )
+        try:
+            return await self.request("textDocument/documentSymbol", {"textDocument": {"uri": uri}})
+        finally:
+            # Indexing walks every file; do not leave them all open in rust-analyzer.
+            if not keep_open and not was_open:
+                await self._close_document(uri)
 
     async def workspace_symbols(self, query: str) -> Any:
         return await self.request("workspace/symbol", {"query": query})
 
-    async def diagnostics(self, relative_path: str | None = None) -> Any:
+    async def diagnostics(
+        self,
+        relative_path: str | None = None,
+        timeout: float = _DIAGNOSTICS_TIMEOUT_SECONDS,
+    ) -> Any:
         if relative_path is None:
             return {
                 _uri_to_relative(uri): diagnostics
@@ -412,19 +842,108 @@ class RustAnalyzerClient:
 
         await self.sync_document(relative_path)
         uri = _relative_path_to_uri(relative_path)
+        if uri in self._diagnostics and uri not in self._stale_diagnostics:
+            return self._diagnostics[uri]
 
-        for _ in range(10):
-            if uri in self._diagnostics:
-                break
-            await asyncio.sleep(0.1)
-
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._diagnostic_waiters.setdefault(uri, []).append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._diagnostic_waiters.get(uri, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                self._diagnostic_waiters.pop(uri, None)
         return self._diagnostics.get(uri, [])
 
+    def _publish_diagnostics(self, params: dict[str, Any]) -> None:
+        uri = params.get("uri")
+        if not uri:
+            return
+        version = params.get("version")
+        if isinstance(version, int) and version < self._versions.get(uri, 0):
+            # Published for an older text; keep the current ones and keep waiting.
+            return
+        self._diagnostics[uri] = params.get("diagnostics", [])
+        self._stale_diagnostics.discard(uri)
+        for waiter in self._diagnostic_waiters.pop(uri, []):
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _end_grace(self) -> None:
+        self._grace_over = True
+        self._update_readiness()
+
+    def _create_progress(self, params: dict[str, Any]) -> None:
+        token = params.get("token")
+        self._created_tokens.add(token)
+        asyncio.get_running_loop().call_later(_READY_GRACE_SECONDS, self._forget_token, token)
+        self._update_readiness()
+
+    def _forget_token(self, token: Any) -> None:
+        self._created_tokens.discard(token)
+        self._update_readiness()
+
+    def _progress(self, params: dict[str, Any]) -> None:
+        token = params.get("token")
+        kind = (params.get("value") or {}).get("kind")
+        if kind == "begin":
+            self._created_tokens.discard(token)
+            self._progress_tokens.add(token)
+        elif kind == "end":
+            self._progress_tokens.discard(token)
+        self._update_readiness()
+
+    def _server_status(self, params: dict[str, Any]) -> None:
+        quiescent = params.get("quiescent")
+        if isinstance(quiescent, bool):
+            self._quiescent = quiescent
+        self._update_readiness()
+
+    def _update_readiness(self) -> None:
+        if self._quiescent is not None:
+            ready = self._quiescent
+        else:
+            ready = self._grace_over and not self._progress_tokens and not self._created_tokens
+        if ready:
+            self._ready.set()
+        else:
+            # Re-indexing (e.g. after a Cargo.toml change) waits only until the start deadline.
+            self._ready.clear()
+
+    def _fail_pending(self, exc: Exception) -> None:
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        # Diagnostics waiters return whatever was published last.
+        waiters, self._diagnostic_waiters = self._diagnostic_waiters, {}
+        for futures in waiters.values():
+            for waiter in futures:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def _answer_server_request(self, request_id: Any, method: str, params: Any) -> None:
+        if method == "window/workDoneProgress/create":
+            self._create_progress(params if isinstance(params, dict) else {})
+            await self._send({"jsonrpc": "2.0", "id": request_id, "result": None})
+            return
+        await self._send(
+            {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": -32601, "message": f"Unsupported method: {method}"},
+            }
+        )
+
     async def _send(self, message: dict[str, Any]) -> None:
         if self.process is None or self.process.stdin is None:
             raise RuntimeError("rust-analyzer process is not running.")
 
-        payload = json.dumps(message).encode("utf-8")
+        payload = _json_dumps(message)
         header = f"Content-Length: {len(payload)}\r\n\r\n".encode("ascii")
 
         async with self._write_lock:
@@ -435,32 +954,44 @@ class RustAnalyzerClient:
         assert self.process is not None
         assert self.process.stdout is not None
 
-        while True:
-            message = await self._read_message()
-            if message is None:
-                return
+        try:
+            while True:
+                message = await self._read_message()
+                if message is None:
+                    return
+                await self._dispatch(message)
+        finally:
+            # EOF (crash or exit): nothing will answer, so fail waiters now.
+            self._fail_pending(
+                RuntimeError("rust-analyzer exited; it is restarted on the next call.")
+            )
 
-            if "id" in message and ("result" in message or "error" in message):
-                request_id = message["id"]
-                future = self._pending.pop(request_id, None)
-                if future is None or future.done():
-                    continue
-                if "error" in message:
-                    error = message["error"]
-                    future.set_exception(
-                        RuntimeError(
-                            json.dumps(error, indent=2) if isinstance(error, dict) else str(error)
-                        )
+    async def _dispatch(self, message: dict[str, Any]) -> None:
+        if "id" in message and ("result" in message or "error" in message):
+            self._consecutive_timeouts = 0
+            future = self._pending.pop(message["id"], None)
+            if future is None or future.done():
+                return
+            if "error" in message:
+                error = message["error"]
+                future.set_exception(
+                    RuntimeError(
+                        json.dumps(error, indent=2) if isinstance(error, dict) else str(error)
                     )
-                else:
-                    future.set_result(message.get("result"))
-                continue
+                )
+            else:
+                future.set_result(message.get("result"))
+            return
 
-            if message.get("method") == "textDocument/publishDiagnostics":
-                params = message.get("params", {})
-                uri = params.get("uri")
-                if uri:
-                    self._diagnostics[uri] = params.get("diagnostics", [])
+        method = message.get("method")
+        if "id" in message and method is not None:
+            await self._answer_server_request(message["id"], method, message.get("params"))
+        elif method == "textDocument/publishDiagnostics":
+            self._publish_diagnostics(message.get("params", {}))
+        elif method == "$/progress":
+            self._progress(message.get("params", {}))
+        elif method == "experimental/serverStatus":
+            self._server_status(message.get("params", {}))
 
     async def _stderr_drain_loop(self) -> None:
         assert self.process is not None
@@ -474,112 +1005,623 @@ class RustAnalyzerClient:
         assert self.process is not None
         assert self.process.stdout is not None
 
-        content_length: int | None = None
-
-        while True:
-            line = await self.process.stdout.readline()
-            if not line:
+        stdout = self.process.stdout
+        buffer = self._buffer
+        header_end = buffer.find(b"\r\n\r\n")
+        while header_end < 0:
+            chunk = await stdout.read(_READ_CHUNK_SIZE)
+            if not chunk:
                 return None
-            if line in (b"\r\n", b"\n"):
-                break
-
-            header = line.decode("utf-8").strip()
-            name, _, value = header.partition(":")
-            if name.lower() == "content-length":
-                content_length = int(value.strip())
-
-        if content_length is None:
-            raise RuntimeError("Missing Content-Length header from rust-analyzer response.")
+            # Only the tail can complete a separator split across reads.
+            search_from = max(0, len(buffer) - 3)
+            buffer += chunk
+            header_end = buffer.find(b"\r\n\r\n", search_from)
+
+        body_start = header_end + 4
+        body_end = body_start + _content_length(buffer[:header_end])
+        while len(buffer) < body_end:
+            chunk = await stdout.read(max(_READ_CHUNK_SIZE, body_end - len(buffer)))
+            if not chunk:
+                return None
+            buffer += chunk
 
-        payload = await self.process.stdout.readexactly(content_length)
-        return json.loads(payload.decode("utf-8"))
+        with memoryview(buffer) as view, view[body_start:body_end] as payload:
+            message = _json_loads(payload)
+        del buffer[:body_end]
+        return message
 
 
 async def _ensure_server() -> RustAnalyzerClient:
     global _server
-    if _server is not None and _server.process is not None:
+    if _server is not None and _server.alive:
         return _server
 
     async with _server_lock:
-        if _server is not None and _server.process is not None:
+        if _server is not None and _server.alive:
             return _server
 
+        # Crashed or hung: replace it and reopen the documents it was tracking.
+        previous, _server = _server, None
+        if previous is not None:
+            await previous.stop()
         server = RustAnalyzerClient(_REPO_ROOT)
-        await server.start()
+        try:
+            await server.start()
+            if previous is not None:
+                await server.reopen_documents(previous)
+        except BaseException:
+            await server.stop()
+            raise
         _server = server
         return server
 
 
+async def _stop_server() -> None:
+    """Stop rust-analyzer (used when the daemon exits)."""
+    global _server
+    async with _server_lock:
+        server, _server = _server, None
+        if server is not None:
+            await server.stop()
+
+
+async def _ready_server() -> RustAnalyzerClient:
+    """Return the server once indexing is done (or its readiness wait has run out)."""
+    server = await _ensure_server()
+    await server.wait_until_ready()
+    return server
+
+
+def _source_files() -> list[Path]:
+    """Return the source files under the allowed paths (bounded by _WARMUP_SCAN_LIMIT)."""
+    return _scan_source_files()[0]
+
+
+def _scan_source_files() -> tuple[list[Path], bool]:
+    """Return the source files under the allowed paths and whether the scan saw all of them."""
+    roots = [_REPO_ROOT] if _allow_all_paths() else [_REPO_ROOT / name for name in _ALLOWED_DIRS]
+    candidates = [(_REPO_ROOT / name) for name in _ALLOWED_FILES]
+    scanned = 0
+    while roots and scanned < _WARMUP_SCAN_LIMIT:
+        try:
+            entries = list(os.scandir(roots.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            scanned += 1
+            if entry.name.startswith(".") or entry.name in _WARMUP_SKIP_DIRS:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                roots.append(Path(entry.path))
+            elif Path(entry.name).suffix in _WARMUP_SUFFIXES:
+                candidates.append(Path(entry.path))
+    return candidates, not roots
+
+
+def _hot_files() -> list[str]:
+    """Return the most recently modified source files under the allowed paths."""
+    stamped = []
+    for path in _source_files():
+        stamp = _file_stamp(path)
+        if stamp is not None:
+            stamped.append((stamp[0], str(path.relative_to(_REPO_ROOT))))
+    return [relative for _, relative in heapq.nlargest(_WARMUP_MAX_FILES, stamped)]
+
+
+async def _warm_up() -> None:
+    try:
+        if _daemon_enabled():
+            await _daemon_connection()
+            return
+        server = await _ensure_server()
+        _schedule_symbol_index_refresh()
+        for relative_path in _hot_files():
+            await server.sync_document(relative_path)
+        await server.wait_until_ready()
+    except Exception:
+        pass  # Warm-up is best effort; the first tool call reports real errors.
+
+
+def _start_warm_up() -> None:
+    global _warmup_task
+    if os.environ.get(_WARMUP_ENV, "").strip().lower() not in {"1", "true", "yes"}:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # Imported outside an event loop: the first tool call starts the server.
+    if _warmup_task is None:
+        _warmup_task = loop.create_task(_warm_up())
+
+
+class _SymbolIndex:
+    """Symbol rows per file with exact/prefix, substring, and subsequence name search."""
+
+    def __init__(
+        self, files: dict[str, dict[str, Any]] | None = None, *, complete: bool = False
+    ) -> None:
+        # path -> {"stamp": [mtime_ns, size], "hash": sha256, "symbols": [[name, kind, line, col]]}
+        self.files: dict[str, dict[str, Any]] = files or {}
+        # False until a refresh has scanned every source file (see _WARMUP_SCAN_LIMIT).
+        self.complete = complete
+        self.refreshed_at = 0.0
+        self._rows: list[tuple[str, str, Any, str, int, int]] | None = None
+        self._keys: list[str] = []
+        self._offsets: list[int] = []
+        self._blob = ""
+
+    @classmethod
+    def load(cls, path: Path) -> _SymbolIndex:
+        try:
+            data = _json_loads(memoryview(path.read_bytes()))
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != _SYMBOL_INDEX_VERSION:
+            return cls()
+        files = data.get("files")
+        complete = data.get("complete") is True
+        return cls(files if isinstance(files, dict) else None, complete=complete)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        scratch = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        payload = {"version": _SYMBOL_INDEX_VERSION, "complete": self.complete, "files": self.files}
+        scratch.write_bytes(_json_dumps(payload))
+        os.replace(scratch, path)
+
+    def update(
+        self, relative_path: str, stamp: tuple[int, int], digest: str, symbols: list[list[Any]]
+    ) -> None:
+        self.files[relative_path] = {"stamp": list(stamp), "hash": digest, "symbols": symbols}
+        self._rows = None
+
+    def remove(self, relative_path: str) -> None:
+        if self.files.pop(relative_path, None) is not None:
+            self._rows = None
+
+    def search(self, query: str, limit: int = _SYMBOL_SEARCH_LIMIT) -> list[tuple[Any, ...]]:
+        """Return (name, kind, path, line, character) rows, best matches first."""
+        needle = query.strip().lower()
+        if not needle:
+            return []
+        if self._rows is None:
+            self._build()
+        assert self._rows is not None
+
+        # Sorted keys: the exact match and then every prefix match are one contiguous run.
+        found: dict[int, None] = {}
+        index = bisect_left(self._keys, needle)
+        while index < len(self._keys) and self._keys[index].startswith(needle):
+            if len(found) >= limit:
+                return [self._rows[index][1:] for index in found]
+            found[index] = None
+            index += 1
+
+        # Then substring and subsequence ("fuzzy") matches: one regex scan over all names.
+        # Each gap is a negated class up to the next character, so nothing backtracks.
+        escaped = [re.escape(char) for char in needle]
+        subsequence = escaped[0] + "".join(f"[^\\n{char}]*{char}" for char in escaped[1:])
+        for pattern in ("".join(escaped), subsequence):
+            for match in re.finditer(pattern, self._blob):
+                if len(found) >= limit:
+                    return [self._rows[index][1:] for index in found]
+                found.setdefault(bisect_right(self._offsets, match.start()) - 1, None)
+        return [self._rows[index][1:] for index in found]
+
+    def _build(self) -> None:
+        # Servers may omit the kind (None), so the kind never takes part in the ordering.
+        self._rows = sorted(
+            (
+                (symbol[0].lower(), symbol[0], symbol[1], path, symbol[2], symbol[3])
+                for path, entry in self.files.items()
+                for symbol in entry["symbols"]
+            ),
+            key=lambda row: (row[0], row[3], row[4], row[5], row[1]),
+        )
+        self._keys = [row[0] for row in self._rows]
+        self._offsets = []
+        offset = 0
+        for key in self._keys:
+            self._offsets.append(offset)
+            offset += len(key) + 1
+        self._blob = "\n".join(self._keys)
+
+
+def _symbol_row(symbol: dict[str, Any]) -> list[Any]:
+    range_data = (
+        symbol.get("selectionRange")
+        or symbol.get("range")
+        or (symbol.get("location") or {}).get("range")
+        or {}
+    )
+    start = range_data.get("start") or {}
+    return [
+        symbol.get("name", ""),
+        symbol.get("kind"),
+        start.get("line", 0),
+        start.get("character", 0),
+    ]
+
+
+def _load_symbol_index() -> _SymbolIndex:
+    global _symbol_index
+    if _symbol_index is None:
+        _symbol_index = _SymbolIndex.load(_SYMBOL_INDEX_PATH)
+    return _symbol_index
+
+
+def _file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+async def _refresh_symbol_index(index: _SymbolIndex) -> None:
+    """Re-read documentSymbol for new or changed files and drop deleted ones."""
+    try:
+        server = await _ensure_server()
+        # Scanning, stat and hashing run in threads: thousands of files would stall the loop.
+        paths, complete = await asyncio.to_thread(_scan_source_files)
+        stamps = await asyncio.to_thread(lambda: [(path, _file_stamp(path)) for path in paths])
+        seen: set[str] = set()
+        stale: list[tuple[Path, str, tuple[int, int]]] = []
+        for path, stamp in stamps:
+            if stamp is None:
+                continue
+            relative_path = str(path.relative_to(_REPO_ROOT))
+            seen.add(relative_path)
+            entry = index.files.get(relative_path)
+            if entry is None or tuple(entry["stamp"]) != stamp:
+                stale.append((path, relative_path, stamp))
+        changed = False
+
+        async def refresh_files(pending: Iterator[tuple[Path, str, tuple[int, int]]]) -> None:
+            nonlocal changed
+            for path, relative_path, stamp in pending:
+                try:
+                    digest = await asyncio.to_thread(_file_digest, path)
+                except OSError:
+                    continue
+                entry = index.files.get(relative_path)
+                if entry is not None and entry["hash"] == digest:
+                    entry["stamp"] = list(stamp)  # Touched, not edited.
+                    changed = True
+                    continue
+                try:
+                    symbols = _flatten_symbols(
+                        await server.document_symbols(relative_path, keep_open=False) or []
+                    )
+                except Exception:
+                    continue  # Left as is; the next refresh tries again.
+                index.update(relative_path, stamp, digest, [_symbol_row(dict(s)) for s in symbols])
+                changed = True
+
+        # A fixed set of workers shares one iterator, so at most _SYMBOL_INDEX_CONCURRENCY
+        # files are in flight however many changed.
+        pending = iter(stale)
+        await asyncio.gather(
+            *(refresh_files(pending) for _ in range(_SYMBOL_INDEX_CONCURRENCY))
+        )
+        unseen = set(index.files) - seen
+        if not complete:
+            # Files past the scan limit were not seen: drop only those that are gone.
+            unseen = set(
+                await asyncio.to_thread(
+                    lambda: [path for path in unseen if not (_REPO_ROOT / path).exists()]
+                )
+            )
+        for relative_path in unseen:
+            index.remove(relative_path)
+            changed = True
+        if index.complete != complete:
+            index.complete = complete
+            changed = True
+        if changed:
+            await asyncio.to_thread(index.save, _SYMBOL_INDEX_PATH)
+    finally:
+        index.refreshed_at = time.monotonic()
+
+
+def _schedule_symbol_index_refresh() -> None:
+    global _symbol_index_task
+    index = _load_symbol_index()
+    if _symbol_index_task is not None and not _symbol_index_task.done():
+        return
+    if index.refreshed_at and time.monotonic() - index.refreshed_at < _SYMBOL_INDEX_REFRESH_SECONDS:
+        return
+    _symbol_index_task = asyncio.ensure_future(_refresh_symbol_index(index))
+    _symbol_index_task.add_done_callback(
+        lambda task: None if task.cancelled() else task.exception()
+    )
+
+
+def _search_symbol_index(query: str) -> list[dict[str, Any]]:
+    """Indexed symbols matching query, skipping files changed since they were indexed."""
+    index = _load_symbol_index()
+    current: dict[str, bool] = {}
+    symbols: list[dict[str, Any]] = []
+    for name, kind, path, line, character in index.search(query):
+        if path not in current:
+            entry = index.files.get(path)
+            stamp = _file_stamp(_REPO_ROOT / path)
+            current[path] = entry is not None and stamp == tuple(entry["stamp"])
+        if current[path]:
+            position = {"line": line, "character": character}
+            uri = (_REPO_ROOT / path).as_uri()
+            location = {"uri": uri, "range": {"start": position, "end": position}}
+            symbols.append({"name": name, "kind": kind, "location": location})
+    return symbols
+
+
+class _DaemonClient:
+    """JSON-lines client for the shared language server daemon of this repo root."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._write_lock = asyncio.Lock()
+        self._next_id = 1
+        self._pending: dict[int, asyncio.Future[str]] = {}
+        self._reader_task = asyncio.create_task(self._reader_loop())
+
+    @classmethod
+    async def connect(cls) -> _DaemonClient:
+        socket_path = str(_daemon_paths()[0])
+        try:
+            return cls(*await asyncio.open_unix_connection(socket_path, limit=_DAEMON_STREAM_LIMIT))
+        except OSError:
+            _spawn_daemon()
+
+        deadline = time.monotonic() + _DAEMON_START_TIMEOUT_SECONDS
+        while True:
+            await asyncio.sleep(0.1)
+            try:
+                return cls(
+                    *await asyncio.open_unix_connection(socket_path, limit=_DAEMON_STREAM_LIMIT)
+                )
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(
+                        f"Language server daemon did not start (socket: {socket_path})."
+                    ) from None
+
+    @property
+    def closed(self) -> bool:
+        return self._reader_task.done()
+
+    async def call(self, tool: str, arguments: dict[str, Any]) -> str:
+        if self.closed:
+            raise RuntimeError("Language server daemon disconnected.")
+        request_id = self._next_id
+        self._next_id += 1
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        line = json.dumps({"id": request_id, "tool": tool, "arguments": arguments}) + "\n"
+        try:
+            async with self._write_lock:
+                self._writer.write(line.encode("utf-8"))
+                await self._writer.drain()
+            return await asyncio.wait_for(future, _DAEMON_CALL_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise RuntimeError(
+                f"Language server daemon did not answer within {_DAEMON_CALL_TIMEOUT_SECONDS:g}s."
+            ) from None
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _reader_loop(self) -> None:
+        try:
+            while line := await self._reader.readline():
+                message = json.loads(line)
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(str(message.get("result", "")))
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("Language server daemon disconnected."))
+            self._pending.clear()
+
+
+def _daemon_enabled() -> bool:
+    if _daemon_serving:
+        return False
+    return os.environ.get(_DAEMON_ENV, "").strip().lower() in {"1", "true", "yes"}
+
+
+def _daemon_directory() -> Path:
+    """Return this user's private (mode 700) directory for daemon sockets and locks."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and Path(runtime_dir).is_dir():
+        directory = Path(runtime_dir) / "fast-agent-lsp"
+    else:
+        directory = Path(tempfile.gettempdir()) / f"fast-agent-lsp-{os.getuid()}"
+    try:
+        directory.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    # Another local user may have created it first (e.g. in a shared /tmp): do not use it.
+    info = directory.lstat()
+    if (
+        directory.is_symlink()
+        or not directory.is_dir()
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise RuntimeError(
+            f"Refusing to use {directory} for the language server daemon: "
+            "it must be a directory owned by the current user with mode 700."
+        )
+    return directory
+
+
+def _daemon_paths() -> tuple[Path, Path, Path]:
+    """Return the socket, lock and log file of the daemon for this module and repo root."""
+    key = f"{Path(__file__).resolve()}:{_REPO_ROOT}".encode("utf-8")
+    base = _daemon_directory() / hashlib.sha256(key).hexdigest()[:16]
+    return base.with_suffix(".sock"), base.with_suffix(".lock"), base.with_suffix(".log")
+
+
+def _spawn_daemon() -> None:
+    log_path = _daemon_paths()[2]
+    with open(log_path, "ab") as log_file:
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "--daemon"],
+            cwd=str(_REPO_ROOT),
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=log_file,
+            start_new_session=True,
+        )
+
+
+async def _daemon_connection() -> _DaemonClient:
+    global _daemon_client
+    client = _daemon_client
+    if client is None or client.closed:
+        async with _daemon_lock:
+            if _daemon_client is None or _daemon_client.closed:
+                _daemon_client = await _DaemonClient.connect()
+            client = _daemon_client
+    return client
+
+
+async def _call_daemon(tool: str, **arguments: Any) -> str:
+    try:
+        client = await _daemon_connection()
+        return await client.call(tool, arguments)
+    except Exception as exc:
+        return f"Error: {exc}"
+
+
 async def lsp_hover(file_path: str, line: int, character: int) -> str:
     """Return hover information for a symbol at the given location."""
+    if _daemon_enabled():
+        return await _call_daemon("lsp_hover", file_path=file_path, line=line, character=character)
     try:
         relative_path = _resolve_relative_path(file_path)
-        server = await _ensure_server()
-        hover = await _retry_on_content_modified(
-            lambda: server.hover(relative_path, line, character)
+        key = ("hover", relative_path, line, character)
+        workspace = _workspace_stamp()
+        cached = _cache_lookup(key, workspace)
+        if cached is not None:
+            return cached
+        server = await _ready_server()
+        hover = await _coalesced_request(
+            key,
+            lambda: server.hover(relative_path, line, character),
         )
         if not hover:
             return "No hover information returned."
-        return _format_hover_contents(hover.get("contents"))
+        text = _format_hover_contents(hover.get("contents"))
+        return _cache_store(key, workspace, text, [relative_path])
     except Exception as exc:
         return f"Error: {exc}"
 
 
 async def lsp_definition(file_path: str, line: int, character: int) -> str:
     """Return definition locations for a symbol at the given location."""
+    if _daemon_enabled():
+        return await _call_daemon(
+            "lsp_definition", file_path=file_path, line=line, character=character
+        )
     try:
         relative_path = _resolve_relative_path(file_path)
-        server = await _ensure_server()
-        result = await _retry_on_content_modified(
-            lambda: server.definition(relative_path, line, character)
+        key = ("definition", relative_path, line, character)
+        workspace = _workspace_stamp()
+        cached = _cache_lookup(key, workspace)
+        if cached is not None:
+            return cached
+        server = await _ready_server()
+        result = await _coalesced_request(
+            key,
+            lambda: server.definition(relative_path, line, character),
         )
         locations = result if isinstance(result, list) else ([result] if result else [])
-        return _format_locations([dict(location) for location in locations])
+        found = [dict(location) for location in locations]
+        text = _format_locations(found)
+        # Empty answers can mean rust-analyzer is still indexing; do not keep them.
+        if not found:
+            return text
+        return _cache_store(key, workspace, text, [relative_path, *_location_paths(found)])
     except Exception as exc:
         return f"Error: {exc}"
 
 
 async def lsp_references(file_path: str, line: int, character: int) -> str:
     """Return reference locations for a symbol at the given location."""
+    if _daemon_enabled():
+        return await _call_daemon(
+            "lsp_references", file_path=file_path, line=line, character=character
+        )
     try:
         relative_path = _resolve_relative_path(file_path)
-        server = await _ensure_server()
-        result = await _retry_on_content_modified(
-            lambda: server.references(relative_path, line, character)
+        key = ("references", relative_path, line, character)
+        workspace = _workspace_stamp()
+        cached = _cache_lookup(key, workspace)
+        if cached is not None:
+            return cached
+        server = await _ready_server()
+        result = await _coalesced_request(
+            key,
+            lambda: server.references(relative_path, line, character),
         )
         locations = result if isinstance(result, list) else ([result] if result else [])
-        return _format_locations([dict(location) for location in locations])
+        found = [dict(location) for location in locations]
+        text = _format_locations(found)
+        # Empty answers can mean rust-analyzer is still indexing; do not keep them.
+        if not found:
+            return text
+        return _cache_store(key, workspace, text, [relative_path, *_location_paths(found)])
     except Exception as exc:
         return f"Error: {exc}"
 
 
 async def lsp_document_symbols(file_path: str) -> str:
     """Return document symbols for a file."""
+    if _daemon_enabled():
+        return await _call_daemon("lsp_document_symbols", file_path=file_path)
     try:
         relative_path = _resolve_relative_path(file_path)
-        server = await _ensure_server()
-        result = await _retry_on_content_modified(lambda: server.document_symbols(relative_path))
+        key = ("document_symbols", relative_path)
+        workspace = _workspace_stamp()
+        cached = _cache_lookup(key, workspace)
+        if cached is not None:
+            return cached
+        server = await _ready_server()
+        result = await _coalesced_request(key, lambda: server.document_symbols(relative_path))
         symbols = result if isinstance(result, list) else []
-        return _format_symbols([dict(symbol) for symbol in symbols], default_path=relative_path)
+        text = _format_symbols([dict(symbol) for symbol in symbols], default_path=relative_path)
+        if not symbols:
+            return text
+        return _cache_store(key, workspace, text, [relative_path])
     except Exception as exc:
         return f"Error: {exc}"
 
 
 async def lsp_workspace_symbols(query: str) -> str:
     """Return workspace symbols matching a query string."""
+    if _daemon_enabled():
+        return await _call_daemon("lsp_workspace_symbols", query=query)
     try:
-        server = await _ensure_server()
-        result = await _retry_on_content_modified(lambda: server.workspace_symbols(query))
+        indexed = _search_symbol_index(query)
+        _schedule_symbol_index_refresh()
+        # A partial index (scan cut off at _WARMUP_SCAN_LIMIT) can miss better matches.
+        if indexed and _load_symbol_index().complete:
+            return _format_symbols(indexed)
+        key = ("workspace_symbols", query)
+        server = await _ready_server()
+        result = await _coalesced_request(key, lambda: server.workspace_symbols(query))
         symbols = result if isinstance(result, list) else []
         if not symbols:
-            return "No symbols returned."
+            return _format_symbols(indexed)
         return _format_symbols([dict(symbol) for symbol in symbols])
     except Exception as exc:
         return f"Error: {exc}"
 
 
 async def lsp_diagnostics(file_path: str | None = None) -> str:
-    """Return cached diagnostics from rust-analyzer."""
+    """Return diagnostics from rust-analyzer, waiting for fresh ones when a file is given."""
+    if _daemon_enabled():
+        return await _call_daemon("lsp_diagnostics", file_path=file_path)
     try:
         server = await _ensure_server()
         relative_path = _resolve_relative_path(file_path) if file_path is not None else None
@@ -587,3 +1629,168 @@ async def lsp_diagnostics(file_path: str | None = None) -> str:
         return json.dumps(diagnostics, indent=2)
     except Exception as exc:
         return f"Error: {exc}"
+
+
+_BATCH_OPERATIONS: dict[str, tuple[Callable[..., Awaitable[str]], tuple[str, ...]]] = {
+    "hover": (lsp_hover, ("file_path", "line", "character")),
+    "definition": (lsp_definition, ("file_path", "line", "character")),
+    "references": (lsp_references, ("file_path", "line", "character")),
+    "document_symbols": (lsp_document_symbols, ("file_path",)),
+    "workspace_symbols": (lsp_workspace_symbols, ("query",)),
+    "diagnostics": (lsp_diagnostics, ("file_path",)),
+}
+
+
+def _describe_operation(operation: Any) -> str:
+    if not isinstance(operation, dict):
+        return "invalid operation"
+    kind = operation.get("kind", "?")
+    if "query" in operation:
+        return f"{kind} {operation['query']!r}"
+    target = str(operation.get("file_path", ""))
+    if "line" in operation and "character" in operation:
+        target = f"{target}:{operation['line']}:{operation['character']}"
+    return f"{kind} {target}".strip()
+
+
+async def _run_batch_operation(operation: Any) -> str:
+    if not isinstance(operation, dict):
+        return "Error: Each operation must be an object."
+    kind = operation.get("kind")
+    entry = _BATCH_OPERATIONS.get(kind) if isinstance(kind, str) else None
+    if entry is None:
+        kinds = ", ".join(_BATCH_OPERATIONS)
+        return f"Error: Unknown operation kind {kind!r}. Use one of: {kinds}."
+    handler, parameters = entry
+    arguments = {name: operation[name] for name in parameters if name in operation}
+    try:
+        return await handler(**arguments)
+    except TypeError as exc:
+        return f"Error: {exc}"
+
+
+async def lsp_batch(operations: list[dict[str, Any]]) -> str:
+    """Run several LSP queries concurrently and return all results in one response.
+
+    Each operation is an object with a ``kind`` (hover, definition, references,
+    document_symbols, workspace_symbols, diagnostics) and that tool's arguments,
+    e.g. ``{"kind": "hover", "file_path": "src/app.py", "line": 10, "character": 4}``.
+    """
+    if not operations:
+        return "No operations given."
+
+    semaphore = asyncio.Semaphore(_BATCH_MAX_CONCURRENCY)
+
+    async def run(operation: Any) -> str:
+        async with semaphore:
+            return await _run_batch_operation(operation)
+
+    results = await asyncio.gather(*(run(operation) for operation in operations))
+    return "\n\n".join(
+        f"### {index}. {_describe_operation(operation)}\n\n{result}"
+        for index, (operation, result) in enumerate(zip(operations, results), start=1)
+    )
+
+
+_DAEMON_TOOLS: dict[str, Callable[..., Awaitable[str]]] = {
+    tool.__name__: tool
+    for tool in (
+        lsp_hover,
+        lsp_definition,
+        lsp_references,
+        lsp_document_symbols,
+        lsp_workspace_symbols,
+        lsp_diagnostics,
+        lsp_batch,
+    )
+}
+
+
+async def _dispatch_daemon_call(message: dict[str, Any]) -> str:
+    tool = _DAEMON_TOOLS.get(message.get("tool", ""))
+    if tool is None:
+        return f"Error: Unknown tool {message.get('tool')!r}."
+    try:
+        return await tool(**(message.get("arguments") or {}))
+    except TypeError as exc:
+        return f"Error: {exc}"
+
+
+async def _serve_daemon() -> None:
+    """Serve the function tools over a Unix socket until idle for _DAEMON_IDLE_SECONDS."""
+    import fcntl
+
+    global _daemon_serving
+    _daemon_serving = True
+    _start_warm_up()
+    socket_path, lock_path, _ = _daemon_paths()
+    lock_file = lock_path.open("w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return  # Another daemon already serves this repo root.
+
+    connections = 0
+    last_activity = time.monotonic()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        nonlocal connections, last_activity
+        connections += 1
+        write_lock = asyncio.Lock()
+        tasks: set[asyncio.Task[None]] = set()
+
+        async def reply(request_id: Any, result: str) -> None:
+            line = json.dumps({"id": request_id, "result": result}) + "\n"
+            async with write_lock:
+                writer.write(line.encode("utf-8"))
+                await writer.drain()
+
+        async def answer(message: dict[str, Any]) -> None:
+            await reply(message.get("id"), await _dispatch_daemon_call(message))
+
+        try:
+            while line := await reader.readline():
+                last_activity = time.monotonic()
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    # A malformed line gets an error answer; the connection keeps serving.
+                    await reply(None, "Error: daemon request is not a JSON object.")
+                    continue
+                task = asyncio.create_task(answer(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            connections -= 1
+            last_activity = time.monotonic()
+            writer.close()
+
+    socket_path.unlink(missing_ok=True)
+    # The socket is created with mode 600: no window in which another user can connect.
+    umask = os.umask(0o077)
+    try:
+        server = await asyncio.start_unix_server(
+            handle, path=str(socket_path), limit=_DAEMON_STREAM_LIMIT
+        )
+    finally:
+        os.umask(umask)
+    try:
+        async with server:
+            while connections or time.monotonic() - last_activity < _DAEMON_IDLE_SECONDS:
+                await asyncio.sleep(min(60.0, _DAEMON_IDLE_SECONDS))
+    finally:
+        socket_path.unlink(missing_ok=True)
+        lock_file.close()
+        await _stop_server()
+
+
+_start_warm_up()
+
+
+if __name__ == "__main__":
+    if "--daemon" in sys.argv[1:]:
+        asyncio.run(_serve_daemon())
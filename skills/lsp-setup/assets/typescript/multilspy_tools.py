@@ -3,14 +3,23 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import heapq
 import json
 import logging
 import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
 from shutil import which
-from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
-from urllib.parse import urlparse
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+from urllib.parse import unquote, urlparse
 
 from multilspy.language_server import LanguageServer
 from multilspy.lsp_protocol_handler.server import ProcessLaunchInfo
@@ -18,6 +27,11 @@ from multilspy.multilspy_config import Language, MultilspyConfig
 from multilspy.multilspy_exceptions import MultilspyException
 from multilspy.multilspy_logger import MultilspyLogger
 
+try:  # Optional: watch the allowed paths so any edit invalidates cached responses.
+    import watchfiles
+except ImportError:  # pragma: no cover - optional dependency
+    watchfiles = None
+
 # REQUIRED: Adjust parents[] if the card is not stored at .fast-agent/agent-cards/.
 _REPO_ROOT = Path(__file__).resolve().parents[2]
 
@@ -32,6 +46,76 @@ _server: "TypeScriptServer" | None = None
 
 _CONTENT_MODIFIED_RETRY_ATTEMPTS = 2
 _CONTENT_MODIFIED_BASE_DELAY_SECONDS = 0.05
+# Upper bound on lsp_batch operations in flight on the one server connection.
+_BATCH_MAX_CONCURRENCY = 8
+# Identical queries in flight at the same time (parallel tool calls) share one request
+# and its retries. Counts of requests sent vs. calls that joined one already in flight.
+_inflight: dict[tuple[Any, ...], asyncio.Future[Any]] = {}
+_request_counts = {"issued": 0, "coalesced": 0}
+
+# Navigation responses are cached per query and reused until any source file under the
+# allowed paths changes: a watcher bumps _workspace_generation on every change (without
+# watchfiles, a stat fingerprint of the source files is compared instead, recomputed at
+# most once per _STAT_STAMP_TTL_SECONDS). The source file and every file in the result
+# must also keep the same mtime and size, which covers edits the watcher (or the
+# fingerprint) has not reported yet. The stamp is taken before the server is asked, so an
+# edit made while a request is in flight invalidates its answer.
+_RESPONSE_CACHE_MAX_ENTRIES = 512
+_response_cache: OrderedDict[
+    tuple[Any, ...], tuple[Any, tuple[tuple[str, tuple[int, int]], ...], str]
+] = OrderedDict()
+_workspace_generation = 0
+_workspace_watch_task: "asyncio.Task[None] | None" = None
+_STAT_STAMP_TTL_SECONDS = 1.0
+_stat_stamp: tuple[float, Any] | None = None
+
+# How long lsp_diagnostics waits for the server to publish after opening a file.
+_DIAGNOSTICS_TIMEOUT_SECONDS = 5.0
+
+# Queries wait for indexing to finish ($/progress), but only until this long after the
+# server starts; later re-indexing does not hold them up past that deadline.
+_READY_TIMEOUT_SECONDS = 30.0
+# A progress token the server has created (window/workDoneProgress/create) holds queries
+# until its begin arrives, for at most this long. Servers that never report progress are
+# ready as soon as they are initialized.
+_READY_GRACE_SECONDS = 1.0
+
+# Set FAST_AGENT_LSP_WARMUP=1 to start the server when the module is imported inside a
+# running event loop and load the most recently modified files under _ALLOWED_DIRS.
+_WARMUP_ENV = "FAST_AGENT_LSP_WARMUP"
+_WARMUP_MAX_FILES = 8
+_WARMUP_SCAN_LIMIT = 20000
+_WARMUP_SUFFIXES = {".ts", ".tsx", ".js", ".jsx", ".mts", ".cts"}
+_WARMUP_SKIP_DIRS = {"node_modules", "dist", "build"}
+_warmup_task: "asyncio.Task[None] | None" = None
+
+# A request typescript-language-server has not answered by then is cancelled ($/cancelRequest) and
+# fails; after this many timeouts in a row the server is treated as hung and restarted.
+_REQUEST_TIMEOUT_SECONDS = 30.0
+_RESTART_AFTER_TIMEOUTS = 3
+
+# lsp_workspace_symbols answers from a persistent index of documentSymbol results for
+# the files under the allowed paths, refreshed in the background (stat, then content
+# hash) for changed files only; the server is asked only when the index has no match.
+_SYMBOL_INDEX_PATH = _REPO_ROOT / ".fast-agent" / "lsp-index" / "typescript.json"
+_SYMBOL_INDEX_VERSION = 1
+_SYMBOL_INDEX_REFRESH_SECONDS = 60.0
+_SYMBOL_INDEX_CONCURRENCY = 4
+_SYMBOL_SEARCH_LIMIT = 100
+_symbol_index: "_SymbolIndex | None" = None
+_symbol_index_task: "asyncio.Task[None] | None" = None
+
+# Set FAST_AGENT_LSP_DAEMON=1 to share one language server per repo root between
+# processes: the tools forward calls to a daemon (started on demand) over a Unix socket.
+_DAEMON_ENV = "FAST_AGENT_LSP_DAEMON"
+_DAEMON_IDLE_SECONDS = 1800.0
+_DAEMON_START_TIMEOUT_SECONDS = 10.0
+# Covers the daemon's readiness wait plus one request with its retries.
+_DAEMON_CALL_TIMEOUT_SECONDS = 120.0
+_DAEMON_STREAM_LIMIT = 64 * 1024 * 1024
+_daemon_lock = asyncio.Lock()
+_daemon_client: "_DaemonClient | None" = None
+_daemon_serving = False
 
 _ReturnT = TypeVar("_ReturnT")
 
@@ -49,6 +133,27 @@ class TypeScriptServer(LanguageServer):
             "typescript",
         )
         self.diagnostics: dict[str, list[dict[str, Any]]] = {}
+        self._diagnostic_events: dict[str, asyncio.Event] = {}
+        # multilspy opens every file as version 0; each didOpen gets the next version per
+        # URI instead, so publishDiagnostics for an earlier open of the file can be told apart.
+        self._open_versions: dict[str, int] = {}
+        self._published_versions: dict[str, int] = {}
+        self._versioned_diagnostics = False
+        self._diagnostics_published = False
+        self._diagnostics_timed_out = False
+        self._base_did_open = self.server.notify.did_open_text_document
+        self.server.notify.did_open_text_document = self._did_open
+        # Indexing state: active $/progress tokens.
+        self._progress_tokens: set[Any] = set()
+        self._created_tokens: set[Any] = set()
+        self._initialized = False
+        self._ready = asyncio.Event()
+        self._ready_deadline = time.monotonic() + _READY_TIMEOUT_SECONDS
+        # Request ids sent from each supervised task, for $/cancelRequest on timeout.
+        self._task_requests: dict[asyncio.Task[Any], set[int]] = {}
+        self._base_send_request = self.server.send.send_request
+        self.server.send.send_request = self._send_request
+        self._consecutive_timeouts = 0
 
     def _get_initialize_params(self, repository_absolute_path: str) -> dict[str, Any]:
         root_uri = Path(repository_absolute_path).as_uri()
@@ -65,6 +170,7 @@ class TypeScriptServer(LanguageServer):
             "capabilities": {
                 "workspace": {"workspaceFolders": True},
                 "textDocument": {"hover": {"contentFormat": ["markdown", "plaintext"]}},
+                "window": {"workDoneProgress": True},
             },
         }
 
@@ -80,27 +186,192 @@ class TypeScriptServer(LanguageServer):
             uri = params.get("uri")
             if not uri:
                 return
-            self.diagnostics[uri] = params.get("diagnostics", [])
+            self._diagnostics_published = True
+            diagnostics = params.get("diagnostics", [])
+            version = params.get("version")
+            if isinstance(version, int):
+                self._versioned_diagnostics = True
+                if version < self._open_versions.get(uri, 0):
+                    return  # Published for an earlier open of the file.
+            elif not diagnostics and (
+                self._versioned_diagnostics or uri not in self.open_file_buffers
+            ):
+                return  # Cleared on didClose; keep what was published while it was open.
+            self.diagnostics[uri] = diagnostics
+            self._published_versions[uri] = self._open_versions.get(uri, 0)
+            event = self._diagnostic_events.pop(uri, None)
+            if event is not None:
+                event.set()
+
+        async def progress(params: dict[str, Any]) -> None:
+            token = params.get("token")
+            kind = (params.get("value") or {}).get("kind")
+            if kind == "begin":
+                self._created_tokens.discard(token)
+                self._progress_tokens.add(token)
+            elif kind == "end":
+                self._progress_tokens.discard(token)
+            self._update_readiness()
 
         self.server.on_notification("window/logMessage", window_log_message)
         self.server.on_request("workspace/executeClientCommand", do_nothing)
-        self.server.on_notification("$/progress", do_nothing)
+        self.server.on_request("window/workDoneProgress/create", self._create_progress)
+        self.server.on_notification("$/progress", progress)
         self.server.on_notification("textDocument/publishDiagnostics", publish_diagnostics)
 
         async with super().start_server():
             self.logger.log("Starting typescript-language-server process", logging.INFO)
             await self.server.start()
-            initialize_params = self._get_initialize_params(self.repository_root_path)
-            self.logger.log(
-                "Sending initialize request from LSP client to typescript-language-server",
-                logging.INFO,
-            )
-            await self.server.send.initialize(initialize_params)
+            try:
+                initialize_params = self._get_initialize_params(self.repository_root_path)
+                self.logger.log(
+                    "Sending initialize request from LSP client to typescript-language-server",
+                    logging.INFO,
+                )
+                await asyncio.wait_for(
+                    self.server.send.initialize(initialize_params), _REQUEST_TIMEOUT_SECONDS
+                )
+            except BaseException:
+                await self.server.stop()
+                raise
             self.server.notify.initialized({})
+            self._ready_deadline = time.monotonic() + _READY_TIMEOUT_SECONDS
+            self._initialized = True
+            self._update_readiness()
             yield self
-            await self.server.shutdown()
+            if self.alive:
+                await self.server.shutdown()
             await self.server.stop()
 
+    @property
+    def alive(self) -> bool:
+        """Whether the server process is running and not hung."""
+        process = self.server.process
+        return (
+            self.server_started
+            and process is not None
+            and process.returncode is None
+            and self._consecutive_timeouts < _RESTART_AFTER_TIMEOUTS
+        )
+
+    async def supervised(self, operation: Awaitable[_ReturnT]) -> _ReturnT:
+        """Await a request; fail on timeout (cancelling it) or as soon as the process exits."""
+        process = self.server.process
+        if process is None:
+            raise MultilspyException("Language server is not running.")
+        request = asyncio.ensure_future(operation)
+        exited = asyncio.ensure_future(process.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {request, exited},
+                timeout=_REQUEST_TIMEOUT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        except asyncio.CancelledError:
+            request.cancel()
+            raise
+        finally:
+            exited.cancel()
+
+        if request in done:
+            self._consecutive_timeouts = 0
+            return request.result()
+
+        for request_id in self._task_requests.pop(request, set()):
+            self.server.send_notification("$/cancelRequest", {"id": request_id})
+        request.cancel()
+        if exited in done:
+            raise MultilspyException(
+                f"typescript-language-server exited (code {process.returncode}); "
+                "it is restarted on the next call."
+            )
+        self._consecutive_timeouts += 1
+        raise MultilspyException(
+            "typescript-language-server did not answer within "
+            f"{_REQUEST_TIMEOUT_SECONDS:g}s; request cancelled."
+        )
+
+    async def _send_request(self, method: str, params: Any = None) -> Any:
+        task = asyncio.current_task()
+        request_ids = self._task_requests.setdefault(task, set()) if task is not None else set()
+        request_id = self.server.request_id
+        request_ids.add(request_id)
+        try:
+            return await self._base_send_request(method, params)
+        finally:
+            request_ids.discard(request_id)
+            if not request_ids:
+                self._task_requests.pop(task, None)
+
+    @property
+    def ready(self) -> bool:
+        """Whether the server has finished indexing."""
+        return self._ready.is_set()
+
+    async def wait_until_ready(self, timeout: float | None = None) -> bool:
+        """Wait for indexing to finish, at most until the readiness deadline or timeout."""
+        if not self._ready.is_set():
+            remaining = self._ready_deadline - time.monotonic()
+            if timeout is not None:
+                remaining = min(remaining, timeout)
+            if remaining > 0:
+                try:
+                    await asyncio.wait_for(self._ready.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        return self._ready.is_set()
+
+    async def _create_progress(self, params: dict[str, Any]) -> None:
+        token = params.get("token")
+        self._created_tokens.add(token)
+        asyncio.get_running_loop().call_later(_READY_GRACE_SECONDS, self._forget_token, token)
+        self._update_readiness()
+
+    def _forget_token(self, token: Any) -> None:
+        self._created_tokens.discard(token)
+        self._update_readiness()
+
+    def _update_readiness(self) -> None:
+        if self._initialized and not self._progress_tokens and not self._created_tokens:
+            self._ready.set()
+        else:
+            # Re-indexing (e.g. after a config change) waits only until the start deadline.
+            self._ready.clear()
+
+    def _did_open(self, params: dict[str, Any]) -> None:
+        document = params["textDocument"]
+        uri = document["uri"]
+        version = self._open_versions[uri] = self._open_versions.get(uri, 0) + 1
+        document["version"] = version
+        buffer = self.open_file_buffers.get(uri)
+        if buffer is not None:
+            buffer.version = version
+        self._base_did_open(params)
+
+    async def wait_for_diagnostics(
+        self, relative_path: str, timeout: float
+    ) -> list[dict[str, Any]]:
+        """Open the file and return diagnostics as soon as the server publishes them."""
+        uri = Path(self.repository_root_path, relative_path).as_uri()
+        published = self._published_versions.get(uri)
+        if uri in self.open_file_buffers and published == self._open_versions.get(uri):
+            # Already open elsewhere and published for: nothing new is coming.
+            return self.diagnostics[uri]
+        if self._diagnostics_timed_out and not self._diagnostics_published:
+            # A full wait passed without any publishDiagnostics: the server does not push.
+            return self.diagnostics.get(uri, [])
+
+        # Set by the first publish for this open (or a later one), not by earlier opens.
+        event = self._diagnostic_events.setdefault(uri, asyncio.Event())
+        with self.open_file(relative_path):
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                self._diagnostics_timed_out = True
+        if self._diagnostic_events.get(uri) is event and not event.is_set():
+            del self._diagnostic_events[uri]
+        return self.diagnostics.get(uri, [])
+
 
 def _resolve_typescript_server_cmd() -> str:
     executable = which("typescript-language-server")
@@ -162,13 +433,22 @@ def _resolve_relative_path(file_path: str) -> str:
 
 async def _ensure_server() -> TypeScriptServer:
     global _server_stack, _server
-    if _server is not None and _server.server_started:
+    if _server is not None and _server.alive:
         return _server
 
     async with _server_lock:
-        if _server is not None and _server.server_started:
+        if _server is not None and _server.alive:
             return _server
 
+        if _server_stack is not None:
+            # Crashed or hung: stop it before starting a fresh process. Files are
+            # opened per request, so there are no documents to reopen.
+            stack, _server_stack, _server = _server_stack, None, None
+            try:
+                await stack.aclose()
+            except Exception:
+                pass
+
         config = MultilspyConfig(code_language=Language.TYPESCRIPT)
         logger = MultilspyLogger()
         server = TypeScriptServer(config, logger, str(_REPO_ROOT))
@@ -179,6 +459,86 @@ async def _ensure_server() -> TypeScriptServer:
         return server
 
 
+async def _stop_server() -> None:
+    """Shut the language server down (used when the daemon exits)."""
+    global _server_stack, _server
+    async with _server_lock:
+        stack, _server_stack, _server = _server_stack, None, None
+        if stack is not None:
+            await stack.aclose()
+
+
+async def _ready_server() -> TypeScriptServer:
+    """Return the server once indexing is done (or its readiness wait has run out)."""
+    server = await _ensure_server()
+    await server.wait_until_ready()
+    return server
+
+
+def _source_files() -> list[Path]:
+    """Return the source files under the allowed paths (bounded by _WARMUP_SCAN_LIMIT)."""
+    return _scan_source_files()[0]
+
+
+def _scan_source_files() -> tuple[list[Path], bool]:
+    """Return the source files under the allowed paths and whether the scan saw all of them."""
+    roots = [_REPO_ROOT] if _allow_all_paths() else [_REPO_ROOT / name for name in _ALLOWED_DIRS]
+    candidates = [(_REPO_ROOT / name) for name in _ALLOWED_FILES]
+    scanned = 0
+    while roots and scanned < _WARMUP_SCAN_LIMIT:
+        try:
+            entries = list(os.scandir(roots.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            scanned += 1
+            if entry.name.startswith(".") or entry.name in _WARMUP_SKIP_DIRS:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                roots.append(Path(entry.path))
+            elif Path(entry.name).suffix in _WARMUP_SUFFIXES:
+                candidates.append(Path(entry.path))
+    return candidates, not roots
+
+
+def _hot_files() -> list[str]:
+    """Return the most recently modified source files under the allowed paths."""
+    stamped = []
+    for path in _source_files():
+        stamp = _file_stamp(path)
+        if stamp is not None:
+            stamped.append((stamp[0], str(path.relative_to(_REPO_ROOT))))
+    return [relative for _, relative in heapq.nlargest(_WARMUP_MAX_FILES, stamped)]
+
+
+async def _warm_up() -> None:
+    try:
+        if _daemon_enabled():
+            await _daemon_connection()
+            return
+        server = await _ensure_server()
+        # multilspy closes files after each request, so "pre-opening" means one
+        # documentSymbol request per hot file: the server parses and indexes it.
+        _schedule_symbol_index_refresh()
+        for relative_path in _hot_files():
+            await server.request_document_symbols(relative_path)
+        await server.wait_until_ready()
+    except Exception:
+        pass  # Warm-up is best effort; the first tool call reports real errors.
+
+
+def _start_warm_up() -> None:
+    global _warmup_task
+    if os.environ.get(_WARMUP_ENV, "").strip().lower() not in {"1", "true", "yes"}:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # Imported outside an event loop: the first tool call starts the server.
+    if _warmup_task is None:
+        _warmup_task = loop.create_task(_warm_up())
+
+
 def _format_range(range_data: dict[str, Any] | None) -> str:
     if not range_data:
         return ""
@@ -195,7 +555,7 @@ def _uri_to_relative(uri: str | None) -> str:
         return ""
     if uri.startswith("file:"):
         parsed = urlparse(uri)
-        path = Path(parsed.path)
+        path = Path(unquote(parsed.path))
         try:
             return str(path.relative_to(_REPO_ROOT))
         except ValueError:
@@ -203,6 +563,119 @@ def _uri_to_relative(uri: str | None) -> str:
     return uri
 
 
+def _file_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _location_paths(locations: list[dict[str, Any]]) -> list[str]:
+    paths: list[str] = []
+    for location in locations:
+        path = (
+            location.get("absolutePath")
+            or location.get("relativePath")
+            or _uri_to_relative(location.get("uri") or location.get("targetUri"))
+        )
+        if path:
+            paths.append(path)
+    return paths
+
+
+def _is_watched_source(change: Any, path: str) -> bool:
+    try:
+        relative_path = Path(path).relative_to(_REPO_ROOT)
+    except ValueError:
+        return False
+    return (
+        relative_path.suffix in _WARMUP_SUFFIXES
+        and _path_is_allowed(relative_path)
+        and not any(
+            part.startswith(".") or part in _WARMUP_SKIP_DIRS for part in relative_path.parts
+        )
+    )
+
+
+async def _watch_workspace() -> None:
+    global _workspace_generation
+    assert watchfiles is not None
+    if _allow_all_paths():
+        roots = [_REPO_ROOT]
+    else:
+        names = sorted({*_ALLOWED_DIRS, *_ALLOWED_FILES})
+        roots = [_REPO_ROOT / name for name in names if (_REPO_ROOT / name).exists()]
+    if not roots:
+        return
+    async for _ in watchfiles.awatch(
+        *roots, watch_filter=_is_watched_source, debounce=200, step=20
+    ):
+        _workspace_generation += 1
+
+
+def _workspace_stamp() -> Any:
+    """Return a value that changes whenever a source file under the allowed paths does."""
+    global _workspace_generation, _workspace_watch_task, _stat_stamp
+    try:
+        loop: asyncio.AbstractEventLoop | None = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    task = _workspace_watch_task
+    restart = task is None or task.get_loop() is not loop
+    if watchfiles is not None and loop is not None and restart:
+        # Anything cached before this watcher started (or under another loop) may be stale.
+        _workspace_generation += 1
+        task = _workspace_watch_task = loop.create_task(_watch_workspace())
+        task.add_done_callback(lambda done: None if done.cancelled() else done.exception())
+    if task is not None and not task.done() and task.get_loop() is loop:
+        return ("watch", _workspace_generation)
+    # Without a watcher every query would walk and stat the whole tree; reuse a recent walk.
+    now = time.monotonic()
+    if _stat_stamp is not None and now - _stat_stamp[0] < _STAT_STAMP_TTL_SECONDS:
+        return _stat_stamp[1]
+    stamp = ("stat", hash(tuple((str(path), _file_stamp(path)) for path in _source_files())))
+    _stat_stamp = (now, stamp)
+    return stamp
+
+
+def _cache_lookup(key: tuple[Any, ...], workspace: Any) -> str | None:
+    """Return a cached response if no source file changed since it was stored.
+
+    ``workspace`` is the current ``_workspace_stamp()``.
+    """
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    stored, stamps, text = entry
+    if stored != workspace or any(
+        _file_stamp(Path(path)) != stamp for path, stamp in stamps
+    ):
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return text
+
+
+def _cache_store(key: tuple[Any, ...], workspace: Any, text: str, paths: list[str]) -> str:
+    """Cache ``text`` against ``workspace`` and the stat of ``paths``; return it.
+
+    ``workspace`` must be the stamp taken before the request was sent.
+    """
+    stamps: list[tuple[str, tuple[int, int]]] = []
+    for path in dict.fromkeys(paths):
+        absolute_path = str(_REPO_ROOT / path)
+        stamp = _file_stamp(Path(absolute_path))
+        if stamp is None:
+            return text
+        stamps.append((absolute_path, stamp))
+    _response_cache[key] = (workspace, tuple(stamps), text)
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > _RESPONSE_CACHE_MAX_ENTRIES:
+        _response_cache.popitem(last=False)
+    return text
+
+
 def _format_locations(locations: list[dict[str, Any]]) -> str:
     if not locations:
         return "No locations returned."
@@ -311,17 +784,414 @@ async def _retry_on_content_modified(operation: Callable[[], Awaitable[_ReturnT]
     raise RuntimeError("Retry loop exhausted unexpectedly.")
 
 
+async def _single_flight(
+    key: tuple[Any, ...], operation: Callable[[], Awaitable[_ReturnT]]
+) -> _ReturnT:
+    """Run ``operation`` once per key at a time; concurrent callers share its result."""
+    task = _inflight.get(key)
+    if task is not None:
+        _request_counts["coalesced"] += 1
+    else:
+        _request_counts["issued"] += 1
+        task = asyncio.ensure_future(operation())
+        _inflight[key] = task
+
+        def forget(done: asyncio.Future[Any]) -> None:
+            if _inflight.get(key) is done:
+                del _inflight[key]
+            if not done.cancelled():
+                done.exception()  # Retrieved here too, in case every caller was cancelled.
+
+        task.add_done_callback(forget)
+    # Shielded: one caller being cancelled must not cancel the request for the others.
+    return await asyncio.shield(task)
+
+
+async def _coalesced_request(
+    key: tuple[Any, ...], operation: Callable[[], Awaitable[_ReturnT]]
+) -> _ReturnT:
+    """Send a request with ContentModified retries, shared by identical concurrent queries."""
+    return await _single_flight(key, lambda: _retry_on_content_modified(operation))
+
+
+class _SymbolIndex:
+    """Symbol rows per file with exact/prefix, substring, and subsequence name search."""
+
+    def __init__(
+        self, files: dict[str, dict[str, Any]] | None = None, *, complete: bool = False
+    ) -> None:
+        # path -> {"stamp": [mtime_ns, size], "hash": sha256, "symbols": [[name, kind, line, col]]}
+        self.files: dict[str, dict[str, Any]] = files or {}
+        # False until a refresh has scanned every source file (see _WARMUP_SCAN_LIMIT).
+        self.complete = complete
+        self.refreshed_at = 0.0
+        self._rows: list[tuple[str, str, Any, str, int, int]] | None = None
+        self._keys: list[str] = []
+        self._offsets: list[int] = []
+        self._blob = ""
+
+    @classmethod
+    def load(cls, path: Path) -> _SymbolIndex:
+        try:
+            data = json.loads(path.read_bytes())
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != _SYMBOL_INDEX_VERSION:
+            return cls()
+        files = data.get("files")
+        complete = data.get("complete") is True
+        return cls(files if isinstance(files, dict) else None, complete=complete)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        scratch = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        payload = {"version": _SYMBOL_INDEX_VERSION, "complete": self.complete, "files": self.files}
+        scratch.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(scratch, path)
+
+    def update(
+        self, relative_path: str, stamp: tuple[int, int], digest: str, symbols: list[list[Any]]
+    ) -> None:
+        self.files[relative_path] = {"stamp": list(stamp), "hash": digest, "symbols": symbols}
+        self._rows = None
+
+    def remove(self, relative_path: str) -> None:
+        if self.files.pop(relative_path, None) is not None:
+            self._rows = None
+
+    def search(self, query: str, limit: int = _SYMBOL_SEARCH_LIMIT) -> list[tuple[Any, ...]]:
+        """Return (name, kind, path, line, character) rows, best matches first."""
+        needle = query.strip().lower()
+        if not needle:
+            return []
+        if self._rows is None:
+            self._build()
+        assert self._rows is not None
+
+        # Sorted keys: the exact match and then every prefix match are one contiguous run.
+        found: dict[int, None] = {}
+        index = bisect_left(self._keys, needle)
+        while index < len(self._keys) and self._keys[index].startswith(needle):
+            if len(found) >= limit:
+                return [self._rows[index][1:] for index in found]
+            found[index] = None
+            index += 1
+
+        # Then substring and subsequence ("fuzzy") matches: one regex scan over all names.
+        # Each gap is a negated class up to the next character, so nothing backtracks.
+        escaped = [re.escape(char) for char in needle]
+        subsequence = escaped[0] + "".join(f"[^\\n{char}]*{char}" for char in escaped[1:])
+        for pattern in ("".join(escaped), subsequence):
+            for match in re.finditer(pattern, self._blob):
+                if len(found) >= limit:
+                    return [self._rows[index][1:] for index in found]
+                found.setdefault(bisect_right(self._offsets, match.start()) - 1, None)
+        return [self._rows[index][1:] for index in found]
+
+    def _build(self) -> None:
+        # Servers may omit the kind (None), so the kind never takes part in the ordering.
+        self._rows = sorted(
+            (
+                (symbol[0].lower(), symbol[0], symbol[1], path, symbol[2], symbol[3])
+                for path, entry in self.files.items()
+                for symbol in entry["symbols"]
+            ),
+            key=lambda row: (row[0], row[3], row[4], row[5], row[1]),
+        )
+        self._keys = [row[0] for row in self._rows]
+        self._offsets = []
+        offset = 0
+        for key in self._keys:
+            self._offsets.append(offset)
+            offset += len(key) + 1
+        self._blob = "\n".join(self._keys)
+
+
+def _symbol_row(symbol: dict[str, Any]) -> list[Any]:
+    range_data = (
+        symbol.get("selectionRange")
+        or symbol.get("range")
+        or (symbol.get("location") or {}).get("range")
+        or {}
+    )
+    start = range_data.get("start") or {}
+    return [
+        symbol.get("name", ""),
+        symbol.get("kind"),
+        start.get("line", 0),
+        start.get("character", 0),
+    ]
+
+
+def _load_symbol_index() -> _SymbolIndex:
+    global _symbol_index
+    if _symbol_index is None:
+        _symbol_index = _SymbolIndex.load(_SYMBOL_INDEX_PATH)
+    return _symbol_index
+
+
+def _file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+async def _refresh_symbol_index(index: _SymbolIndex) -> None:
+    """Re-read documentSymbol for new or changed files and drop deleted ones."""
+    try:
+        server = await _ensure_server()
+        # Scanning, stat and hashing run in threads: thousands of files would stall the loop.
+        paths, complete = await asyncio.to_thread(_scan_source_files)
+        stamps = await asyncio.to_thread(lambda: [(path, _file_stamp(path)) for path in paths])
+        seen: set[str] = set()
+        stale: list[tuple[Path, str, tuple[int, int]]] = []
+        for path, stamp in stamps:
+            if stamp is None:
+                continue
+            relative_path = str(path.relative_to(_REPO_ROOT))
+            seen.add(relative_path)
+            entry = index.files.get(relative_path)
+            if entry is None or tuple(entry["stamp"]) != stamp:
+                stale.append((path, relative_path, stamp))
+        changed = False
+
+        async def refresh_files(pending: Iterator[tuple[Path, str, tuple[int, int]]]) -> None:
+            nonlocal changed
+            for path, relative_path, stamp in pending:
+                try:
+                    digest = await asyncio.to_thread(_file_digest, path)
+                except OSError:
+                    continue
+                entry = index.files.get(relative_path)
+                if entry is not None and entry["hash"] == digest:
+                    entry["stamp"] = list(stamp)  # Touched, not edited.
+                    changed = True
+                    continue
+                try:
+                    symbols = (
+                        await server.supervised(server.request_document_symbols(relative_path))
+                    )[0]
+                except Exception:
+                    continue  # Left as is; the next refresh tries again.
+                index.update(relative_path, stamp, digest, [_symbol_row(dict(s)) for s in symbols])
+                changed = True
+
+        # A fixed set of workers shares one iterator, so at most _SYMBOL_INDEX_CONCURRENCY
+        # files are in flight however many changed.
+        pending = iter(stale)
+        await asyncio.gather(
+            *(refresh_files(pending) for _ in range(_SYMBOL_INDEX_CONCURRENCY))
+        )
+        unseen = set(index.files) - seen
+        if not complete:
+            # Files past the scan limit were not seen: drop only those that are gone.
+            unseen = set(
+                await asyncio.to_thread(
+                    lambda: [path for path in unseen if not (_REPO_ROOT / path).exists()]
+                )
+            )
+        for relative_path in unseen:
+            index.remove(relative_path)
+            changed = True
+        if index.complete != complete:
+            index.complete = complete
+            changed = True
+        if changed:
+            await asyncio.to_thread(index.save, _SYMBOL_INDEX_PATH)
+    finally:
+        index.refreshed_at = time.monotonic()
+
+
+def _schedule_symbol_index_refresh() -> None:
+    global _symbol_index_task
+    index = _load_symbol_index()
+    if _symbol_index_task is not None and not _symbol_index_task.done():
+        return
+    if index.refreshed_at and time.monotonic() - index.refreshed_at < _SYMBOL_INDEX_REFRESH_SECONDS:
+        return
+    _symbol_index_task = asyncio.ensure_future(_refresh_symbol_index(index))
+    _symbol_index_task.add_done_callback(
+        lambda task: None if task.cancelled() else task.exception()
+    )
+
+
+def _search_symbol_index(query: str) -> list[dict[str, Any]]:
+    """Indexed symbols matching query, skipping files changed since they were indexed."""
+    index = _load_symbol_index()
+    current: dict[str, bool] = {}
+    symbols: list[dict[str, Any]] = []
+    for name, kind, path, line, character in index.search(query):
+        if path not in current:
+            entry = index.files.get(path)
+            stamp = _file_stamp(_REPO_ROOT / path)
+            current[path] = entry is not None and stamp == tuple(entry["stamp"])
+        if current[path]:
+            position = {"line": line, "character": character}
+            location = {"relativePath": path, "range": {"start": position, "end": position}}
+            symbols.append({"name": name, "kind": kind, "location": location})
+    return symbols
+
+
+class _DaemonClient:
+    """JSON-lines client for the shared language server daemon of this repo root."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._write_lock = asyncio.Lock()
+        self._next_id = 1
+        self._pending: dict[int, asyncio.Future[str]] = {}
+        self._reader_task = asyncio.create_task(self._reader_loop())
+
+    @classmethod
+    async def connect(cls) -> _DaemonClient:
+        socket_path = str(_daemon_paths()[0])
+        try:
+            return cls(*await asyncio.open_unix_connection(socket_path, limit=_DAEMON_STREAM_LIMIT))
+        except OSError:
+            _spawn_daemon()
+
+        deadline = time.monotonic() + _DAEMON_START_TIMEOUT_SECONDS
+        while True:
+            await asyncio.sleep(0.1)
+            try:
+                return cls(
+                    *await asyncio.open_unix_connection(socket_path, limit=_DAEMON_STREAM_LIMIT)
+                )
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(
+                        f"Language server daemon did not start (socket: {socket_path})."
+                    ) from None
+
+    @property
+    def closed(self) -> bool:
+        return self._reader_task.done()
+
+    async def call(self, tool: str, arguments: dict[str, Any]) -> str:
+        if self.closed:
+            raise RuntimeError("Language server daemon disconnected.")
+        request_id = self._next_id
+        self._next_id += 1
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        line = json.dumps({"id": request_id, "tool": tool, "arguments": arguments}) + "\n"
+        try:
+            async with self._write_lock:
+                self._writer.write(line.encode("utf-8"))
+                await self._writer.drain()
+            return await asyncio.wait_for(future, _DAEMON_CALL_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise RuntimeError(
+                f"Language server daemon did not answer within {_DAEMON_CALL_TIMEOUT_SECONDS:g}s."
+            ) from None
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _reader_loop(self) -> None:
+        try:
+            while line := await self._reader.readline():
+                message = json.loads(line)
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(str(message.get("result", "")))
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("Language server daemon disconnected."))
+            self._pending.clear()
+
+
+def _daemon_enabled() -> bool:
+    if _daemon_serving:
+        return False
+    return os.environ.get(_DAEMON_ENV, "").strip().lower() in {"1", "true", "yes"}
+
+
+def _daemon_directory() -> Path:
+    """Return this user's private (mode 700) directory for daemon sockets and locks."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and Path(runtime_dir).is_dir():
+        directory = Path(runtime_dir) / "fast-agent-lsp"
+    else:
+        directory = Path(tempfile.gettempdir()) / f"fast-agent-lsp-{os.getuid()}"
+    try:
+        directory.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    # Another local user may have created it first (e.g. in a shared /tmp): do not use it.
+    info = directory.lstat()
+    if (
+        directory.is_symlink()
+        or not directory.is_dir()
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise RuntimeError(
+            f"Refusing to use {directory} for the language server daemon: "
+            "it must be a directory owned by the current user with mode 700."
+        )
+    return directory
+
+
+def _daemon_paths() -> tuple[Path, Path, Path]:
+    """Return the socket, lock and log file of the daemon for this module and repo root."""
+    key = f"{Path(__file__).resolve()}:{_REPO_ROOT}".encode("utf-8")
+    base = _daemon_directory() / hashlib.sha256(key).hexdigest()[:16]
+    return base.with_suffix(".sock"), base.with_suffix(".lock"), base.with_suffix(".log")
+
+
+def _spawn_daemon() -> None:
+    log_path = _daemon_paths()[2]
+    with open(log_path, "ab") as log_file:
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "--daemon"],
+            cwd=str(_REPO_ROOT),
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=log_file,
+            start_new_session=True,
+        )
+
+
+async def _daemon_connection() -> _DaemonClient:
+    global _daemon_client
+    client = _daemon_client
+    if client is None or client.closed:
+        async with _daemon_lock:
+            if _daemon_client is None or _daemon_client.closed:
+                _daemon_client = await _DaemonClient.connect()
+            client = _daemon_client
+    return client
+
+
+async def _call_daemon(tool: str, **arguments: Any) -> str:
+    try:
+        client = await _daemon_connection()
+        return await client.call(tool, arguments)
+    except Exception as exc:
+        return f"Error: {exc}"
+
+
 async def lsp_hover(file_path: str, line: int, character: int) -> str:
     """Return hover information for a symbol at the given location."""
+    if _daemon_enabled():
+        return await _call_daemon("lsp_hover", file_path=file_path, line=line, character=character)
     try:
         relative_path = _resolve_relative_path(file_path)
-        server = await _ensure_server()
-        hover = await _retry_on_content_modified(
-            lambda: server.request_hover(relative_path, line, character)
+        key = ("hover", relative_path, line, character)
+        workspace = _workspace_stamp()
+        cached = _cache_lookup(key, workspace)
+        if cached is not None:
+            return cached
+        server = await _ready_server()
+        hover = await _coalesced_request(
+            key,
+            lambda: server.supervised(server.request_hover(relative_path, line, character)),
         )
         if not hover:
             return "No hover information returned."
-        return _format_hover_contents(hover.get("contents"))
+        text = _format_hover_contents(hover.get("contents"))
+        return _cache_store(key, workspace, text, [relative_path])
     except (ValueError, MultilspyException) as exc:
         return f"Error: {exc}"
     except Exception as exc:  # pragma: no cover - defensive guard
@@ -330,15 +1200,28 @@ async def lsp_hover(file_path: str, line: int, character: int) -> str:
 
 async def lsp_definition(file_path: str, line: int, character: int) -> str:
     """Return definition locations for a symbol at the given location."""
+    if _daemon_enabled():
+        return await _call_daemon(
+            "lsp_definition", file_path=file_path, line=line, character=character
+        )
     try:
         relative_path = _resolve_relative_path(file_path)
-        server = await _ensure_server()
-        locations = await _retry_on_content_modified(
-            lambda: server.request_definition(relative_path, line, character)
+        key = ("definition", relative_path, line, character)
+        workspace = _workspace_stamp()
+        cached = _cache_lookup(key, workspace)
+        if cached is not None:
+            return cached
+        server = await _ready_server()
+        locations = await _coalesced_request(
+            key,
+            lambda: server.supervised(server.request_definition(relative_path, line, character)),
         )
         if not locations:
             return "No locations returned."
-        return _format_locations([dict(location) for location in locations])
+        found = [dict(location) for location in locations]
+        return _cache_store(
+            key, _format_locations(found), [relative_path, *_location_paths(found)]
+        )
     except (ValueError, MultilspyException) as exc:
         message = str(exc)
         if "Unexpected response from Language Server" in message:
@@ -353,15 +1236,28 @@ async def lsp_definition(file_path: str, line: int, character: int) -> str:
 
 async def lsp_references(file_path: str, line: int, character: int) -> str:
     """Return reference locations for a symbol at the given location."""
+    if _daemon_enabled():
+        return await _call_daemon(
+            "lsp_references", file_path=file_path, line=line, character=character
+        )
     try:
         relative_path = _resolve_relative_path(file_path)
-        server = await _ensure_server()
-        locations = await _retry_on_content_modified(
-            lambda: server.request_references(relative_path, line, character)
+        key = ("references", relative_path, line, character)
+        workspace = _workspace_stamp()
+        cached = _cache_lookup(key, workspace)
+        if cached is not None:
+            return cached
+        server = await _ready_server()
+        locations = await _coalesced_request(
+            key,
+            lambda: server.supervised(server.request_references(relative_path, line, character)),
         )
         if not locations:
             return "No locations returned."
-        return _format_locations([dict(location) for location in locations])
+        found = [dict(location) for location in locations]
+        return _cache_store(
+            key, _format_locations(found), [relative_path, *_location_paths(found)]
+        )
     except (ValueError, MultilspyException) as exc:
         message = str(exc)
         if "Unexpected response from Language Server" in message:
@@ -376,13 +1272,25 @@ async def lsp_references(file_path: str, line: int, character: int) -> str:
 
 async def lsp_document_symbols(file_path: str) -> str:
     """Return document symbols for a file."""
+    if _daemon_enabled():
+        return await _call_daemon("lsp_document_symbols", file_path=file_path)
     try:
         relative_path = _resolve_relative_path(file_path)
-        server = await _ensure_server()
-        symbols, _ = await _retry_on_content_modified(
-            lambda: server.request_document_symbols(relative_path)
+        key = ("document_symbols", relative_path)
+        workspace = _workspace_stamp()
+        cached = _cache_lookup(key, workspace)
+        if cached is not None:
+            return cached
+        server = await _ready_server()
+        symbols, _ = await _coalesced_request(
+            key,
+            lambda: server.supervised(server.request_document_symbols(relative_path)),
         )
-        return _format_symbols([dict(symbol) for symbol in symbols], default_path=relative_path)
+        text = _format_symbols([dict(symbol) for symbol in symbols], default_path=relative_path)
+        # Empty answers can mean the server is still indexing; do not keep them.
+        if not symbols:
+            return text
+        return _cache_store(key, workspace, text, [relative_path])
     except (ValueError, MultilspyException) as exc:
         return f"Error: {exc}"
     except Exception as exc:  # pragma: no cover - defensive guard
@@ -391,11 +1299,22 @@ async def lsp_document_symbols(file_path: str) -> str:
 
 async def lsp_workspace_symbols(query: str) -> str:
     """Return workspace symbols matching a query string."""
+    if _daemon_enabled():
+        return await _call_daemon("lsp_workspace_symbols", query=query)
     try:
-        server = await _ensure_server()
-        symbols = await _retry_on_content_modified(lambda: server.request_workspace_symbol(query))
-        if symbols is None:
-            return "No symbols returned."
+        indexed = _search_symbol_index(query)
+        _schedule_symbol_index_refresh()
+        # A partial index (scan cut off at _WARMUP_SCAN_LIMIT) can miss better matches.
+        if indexed and _load_symbol_index().complete:
+            return _format_symbols(indexed)
+        key = ("workspace_symbols", query)
+        server = await _ready_server()
+        symbols = await _coalesced_request(
+            key,
+            lambda: server.supervised(server.request_workspace_symbol(query)),
+        )
+        if not symbols:
+            return _format_symbols(indexed)
         return _format_symbols([dict(symbol) for symbol in symbols])
     except (ValueError, MultilspyException) as exc:
         return f"Error: {exc}"
@@ -404,7 +1323,9 @@ async def lsp_workspace_symbols(query: str) -> str:
 
 
 async def lsp_diagnostics(file_path: str | None = None) -> str:
-    """Return cached diagnostics from typescript-language-server."""
+    """Return diagnostics, waiting for fresh ones from the server when a file is given."""
+    if _daemon_enabled():
+        return await _call_daemon("lsp_diagnostics", file_path=file_path)
     try:
         server = await _ensure_server()
         if file_path is None:
@@ -412,7 +1333,9 @@ async def lsp_diagnostics(file_path: str | None = None) -> str:
         else:
             relative_path = _resolve_relative_path(file_path)
             uri = Path(_REPO_ROOT / relative_path).as_uri()
-            diagnostics = {uri: server.diagnostics.get(uri, [])}
+            diagnostics = {
+                uri: await server.wait_for_diagnostics(relative_path, _DIAGNOSTICS_TIMEOUT_SECONDS)
+            }
         if not diagnostics:
             return "No diagnostics cached."
         return json.dumps(diagnostics, indent=2)
@@ -420,3 +1343,168 @@ async def lsp_diagnostics(file_path: str | None = None) -> str:
         return f"Error: {exc}"
     except Exception as exc:  # pragma: no cover - defensive guard
         return f"Error: {exc}"
+
+
+_BATCH_OPERATIONS: dict[str, tuple[Callable[..., Awaitable[str]], tuple[str, ...]]] = {
+    "hover": (lsp_hover, ("file_path", "line", "character")),
+    "definition": (lsp_definition, ("file_path", "line", "character")),
+    "references": (lsp_references, ("file_path", "line", "character")),
+    "document_symbols": (lsp_document_symbols, ("file_path",)),
+    "workspace_symbols": (lsp_workspace_symbols, ("query",)),
+    "diagnostics": (lsp_diagnostics, ("file_path",)),
+}
+
+
+def _describe_operation(operation: Any) -> str:
+    if not isinstance(operation, dict):
+        return "invalid operation"
+    kind = operation.get("kind", "?")
+    if "query" in operation:
+        return f"{kind} {operation['query']!r}"
+    target = str(operation.get("file_path", ""))
+    if "line" in operation and "character" in operation:
+        target = f"{target}:{operation['line']}:{operation['character']}"
+    return f"{kind} {target}".strip()
+
+
+async def _run_batch_operation(operation: Any) -> str:
+    if not isinstance(operation, dict):
+        return "Error: Each operation must be an object."
+    kind = operation.get("kind")
+    entry = _BATCH_OPERATIONS.get(kind) if isinstance(kind, str) else None
+    if entry is None:
+        kinds = ", ".join(_BATCH_OPERATIONS)
+        return f"Error: Unknown operation kind {kind!r}. Use one of: {kinds}."
+    handler, parameters = entry
+    arguments = {name: operation[name] for name in parameters if name in operation}
+    try:
+        return await handler(**arguments)
+    except TypeError as exc:
+        return f"Error: {exc}"
+
+
+async def lsp_batch(operations: list[dict[str, Any]]) -> str:
+    """Run several LSP queries concurrently and return all results in one response.
+
+    Each operation is an object with a ``kind`` (hover, definition, references,
+    document_symbols, workspace_symbols, diagnostics) and that tool's arguments,
+    e.g. ``{"kind": "hover", "file_path": "src/app.py", "line": 10, "character": 4}``.
+    """
+    if not operations:
+        return "No operations given."
+
+    semaphore = asyncio.Semaphore(_BATCH_MAX_CONCURRENCY)
+
+    async def run(operation: Any) -> str:
+        async with semaphore:
+            return await _run_batch_operation(operation)
+
+    results = await asyncio.gather(*(run(operation) for operation in operations))
+    return "\n\n".join(
+        f"### {index}. {_describe_operation(operation)}\n\n{result}"
+        for index, (operation, result) in enumerate(zip(operations, results), start=1)
+    )
+
+
+_DAEMON_TOOLS: dict[str, Callable[..., Awaitable[str]]] = {
+    tool.__name__: tool
+    for tool in (
+        lsp_hover,
+        lsp_definition,
+        lsp_references,
+        lsp_document_symbols,
+        lsp_workspace_symbols,
+        lsp_diagnostics,
+        lsp_batch,
+    )
+}
+
+
+async def _dispatch_daemon_call(message: dict[str, Any]) -> str:
+    tool = _DAEMON_TOOLS.get(message.get("tool", ""))
+    if tool is None:
+        return f"Error: Unknown tool {message.get('tool')!r}."
+    try:
+        return await tool(**(message.get("arguments") or {}))
+    except TypeError as exc:
+        return f"Error: {exc}"
+
+
+async def _serve_daemon() -> None:
+    """Serve the function tools over a Unix socket until idle for _DAEMON_IDLE_SECONDS."""
+    import fcntl
+
+    global _daemon_serving
+    _daemon_serving = True
+    _start_warm_up()
+    socket_path, lock_path, _ = _daemon_paths()
+    lock_file = lock_path.open("w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return  # Another daemon already serves this repo root.
+
+    connections = 0
+    last_activity = time.monotonic()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        nonlocal connections, last_activity
+        connections += 1
+        write_lock = asyncio.Lock()
+        tasks: set[asyncio.Task[None]] = set()
+
+        async def reply(request_id: Any, result: str) -> None:
+            line = json.dumps({"id": request_id, "result": result}) + "\n"
+            async with write_lock:
+                writer.write(line.encode("utf-8"))
+                await writer.drain()
+
+        async def answer(message: dict[str, Any]) -> None:
+            await reply(message.get("id"), await _dispatch_daemon_call(message))
+
+        try:
+            while line := await reader.readline():
+                last_activity = time.monotonic()
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    # A malformed line gets an error answer; the connection keeps serving.
+                    await reply(None, "Error: daemon request is not a JSON object.")
+                    continue
+                task = asyncio.create_task(answer(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            connections -= 1
+            last_activity = time.monotonic()
+            writer.close()
+
+    socket_path.unlink(missing_ok=True)
+    # The socket is created with mode 600: no window in which another user can connect.
+    umask = os.umask(0o077)
+    try:
+        server = await asyncio.start_unix_server(
+            handle, path=str(socket_path), limit=_DAEMON_STREAM_LIMIT
+        )
+    finally:
+        os.umask(umask)
+    try:
+        async with server:
+            while connections or time.monotonic() - last_activity < _DAEMON_IDLE_SECONDS:
+                await asyncio.sleep(min(60.0, _DAEMON_IDLE_SECONDS))
+    finally:
+        socket_path.unlink(missing_ok=True)
+        lock_file.close()
+        await _stop_server()
+
+
+_start_warm_up()
+
+
+if __name__ == "__main__":
+    if "--daemon" in sys.argv[1:]:
+        asyncio.run(_serve_daemon())
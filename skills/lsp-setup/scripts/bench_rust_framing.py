@@ -0,0 +1,202 @@
+"""Benchmark JSON-RPC framing in ``rust_lsp_tools.RustAnalyzerClient``.
+
+A fake language server (this script with ``--serve``) replays LSP responses from
+a JSON-lines file as fast as the pipe allows. Each reader drains the stream and
+reports throughput in MB/s:
+
+- ``readline``: the previous one-``readline()``-per-header reader (baseline)
+- ``buffered-json``: ``RustAnalyzerClient._read_message`` with the stdlib decoder
+- ``buffered-orjson``: the same reader with ``orjson`` (when installed)
+
+Record real responses (one JSON-RPC response object per line) to replay them, or
+let the script generate large ``textDocument/references`` results.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Awaitable, Callable
+
+_DEFAULT_TOOLS = Path(__file__).resolve().parents[1] / "assets" / "rust" / "rust_lsp_tools.py"
+
+
+def _frame(line: bytes) -> bytes:
+    return b"Content-Length: %d\r\n\r\n%s" % (len(line), line)
+
+
+def _serve(responses: Path, repeat: int) -> None:
+    frames = [
+        _frame(line.strip())
+        for line in responses.read_bytes().splitlines()
+        if line.strip()
+    ]
+    out = sys.stdout.buffer
+    for _ in range(repeat):
+        for frame in frames:
+            out.write(frame)
+    out.flush()
+
+
+def _synthetic_responses(path: Path, count: int, locations: int) -> None:
+    with path.open("w", encoding="utf-8") as handle:
+        for request_id in range(count):
+            result = [
+                {
+                    "uri": f"file:///repo/crates/core/src/module_{index % 97}.rs",
+                    "range": {
+                        "start": {"line": index, "character": 4},
+                        "end": {"line": index, "character": 18},
+                    },
+                }
+                for index in range(locations)
+            ]
+            handle.write(json.dumps({"jsonrpc": "2.0", "id": request_id, "result": result}))
+            handle.write("\n")
+
+
+def _load_tools(path: Path) -> ModuleType:
+    spec = importlib.util.spec_from_file_location("rust_lsp_tools", path)
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f"Cannot load rust_lsp_tools from {path}")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+async def _readline_read_message(stdout: asyncio.StreamReader) -> dict[str, Any] | None:
+    """The reader ``RustAnalyzerClient`` used before buffered framing."""
+    content_length: int | None = None
+    while True:
+        line = await stdout.readline()
+        if not line:
+            return None
+        if line in (b"\r\n", b"\n"):
+            break
+        header = line.decode("utf-8").strip()
+        name, _, value = header.partition(":")
+        if name.lower() == "content-length":
+            content_length = int(value.strip())
+    if content_length is None:
+        raise RuntimeError("Missing Content-Length header.")
+    payload = await stdout.readexactly(content_length)
+    return json.loads(payload.decode("utf-8"))
+
+
+Reader = Callable[[asyncio.subprocess.Process], Callable[[], Awaitable[Any]]]
+
+
+def _readers(tools: ModuleType) -> dict[str, tuple[Reader, Any]]:
+    def readline(process: asyncio.subprocess.Process) -> Callable[[], Awaitable[Any]]:
+        assert process.stdout is not None
+        stdout = process.stdout
+        return lambda: _readline_read_message(stdout)
+
+    def buffered(process: asyncio.subprocess.Process) -> Callable[[], Awaitable[Any]]:
+        client = tools.RustAnalyzerClient(Path.cwd())
+        client.process = process
+        return client._read_message
+
+    readers: dict[str, tuple[Reader, Any]] = {
+        "readline": (readline, None),
+        "buffered-json": (buffered, None),
+    }
+    if tools.orjson is not None:
+        readers["buffered-orjson"] = (buffered, tools.orjson)
+    return readers
+
+
+async def _measure(
+    name: str,
+    reader: Reader,
+    responses: Path,
+    repeat: int,
+) -> dict[str, object]:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        __file__,
+        "--serve",
+        str(responses),
+        "--repeat",
+        str(repeat),
+        stdout=asyncio.subprocess.PIPE,
+        limit=2**20,
+    )
+    read_message = reader(process)
+    messages = 0
+    start = time.perf_counter()
+    while await read_message() is not None:
+        messages += 1
+    seconds = time.perf_counter() - start
+    await process.wait()
+    return {"reader": name, "messages": messages, "seconds": round(seconds, 4)}
+
+
+async def _run(args: argparse.Namespace) -> list[dict[str, object]]:
+    tools = _load_tools(Path(args.tools).expanduser())
+    with tempfile.TemporaryDirectory() as scratch:
+        responses = Path(args.responses).expanduser() if args.responses else None
+        if responses is None:
+            responses = Path(scratch) / "responses.jsonl"
+            _synthetic_responses(responses, args.count, args.locations)
+        frame_bytes = sum(
+            len(_frame(line.strip()))
+            for line in responses.read_bytes().splitlines()
+            if line.strip()
+        )
+        total_mb = frame_bytes * args.repeat / 1e6
+
+        results: list[dict[str, object]] = []
+        for name, (reader, backend) in _readers(tools).items():
+            tools.orjson = backend
+            result = await _measure(name, reader, responses, args.repeat)
+            result["mb"] = round(total_mb, 2)
+            result["mb_per_s"] = round(total_mb / result["seconds"], 2)
+            print(
+                f"{name:<16} {result['messages']:>7} msgs  {result['seconds']:>8.3f} s  "
+                f"{result['mb_per_s']:>8.2f} MB/s"
+            )
+            results.append(result)
+    return results
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--responses", help="JSON-lines file of recorded LSP responses")
+    parser.add_argument("--count", type=int, default=20, help="Synthetic responses (default: 20)")
+    parser.add_argument(
+        "--locations",
+        type=int,
+        default=5000,
+        help="Locations per synthetic references response (default: 5000)",
+    )
+    parser.add_argument("--repeat", type=int, default=10, help="Replay the responses N times")
+    parser.add_argument("--tools", default=str(_DEFAULT_TOOLS), help="Path to rust_lsp_tools.py")
+    parser.add_argument("--output", help="Optional path to write JSON results")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    if args.serve:
+        _serve(Path(args.serve), args.repeat)
+        return
+
+    results = asyncio.run(_run(args))
+    if args.output:
+        output = Path(args.output).expanduser()
+        output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
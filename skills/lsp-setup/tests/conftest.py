@@ -0,0 +1,56 @@
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+_ASSETS = Path(__file__).resolve().parents[1] / "assets"
+_MODULES = {
+    "python": "python/multilspy_tools.py",
+    "typescript": "typescript/multilspy_tools.py",
+    "rust": "rust/rust_lsp_tools.py",
+}
+
+
+def _load(language: str) -> ModuleType:
+    """Load a fresh copy of the helper module, the way agent cards load it by path."""
+    if language != "rust":
+        pytest.importorskip("multilspy")
+    spec = importlib.util.spec_from_file_location(
+        f"lsp_tools_{language}", _ASSETS / _MODULES[language]
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=sorted(_MODULES))
+def tools(request: pytest.FixtureRequest) -> ModuleType:
+    """Each language's helper module."""
+    return _load(request.param)
+
+
+@pytest.fixture
+def rust_tools() -> ModuleType:
+    return _load("rust")
+
+
+@pytest.fixture
+def python_tools() -> ModuleType:
+    return _load("python")
+
+
+@pytest.fixture
+def typescript_tools() -> ModuleType:
+    return _load("typescript")
+
+
+@pytest.fixture
+def workspace(tools: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Point the helper module at an empty repo root whose only allowed dir is src/."""
+    (tmp_path / "src").mkdir()
+    monkeypatch.setattr(tools, "_REPO_ROOT", tmp_path)
+    monkeypatch.setattr(tools, "_ALLOWED_DIRS", {"src"})
+    monkeypatch.setattr(tools, "_ALLOWED_FILES", set())
+    return tmp_path
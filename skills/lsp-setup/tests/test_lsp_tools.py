@@ -0,0 +1,500 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import shutil
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+
+def _source(tools: ModuleType, workspace: Path, name: str, text: str) -> Path:
+    path = workspace / "src" / f"{name}{sorted(tools._WARMUP_SUFFIXES)[0]}"
+    path.write_text(text)
+    return path
+
+
+def test_cache_survives_unrelated_files(tools: ModuleType, workspace: Path) -> None:
+    queried = _source(tools, workspace, "queried", "a = 1\n")
+
+    async def run() -> str | None:
+        stamp = tools._workspace_stamp()
+        tools._cache_store(("hover", "q"), stamp, "cached", [str(queried.relative_to(workspace))])
+        await asyncio.sleep(0.3)
+        return tools._cache_lookup(("hover", "q"), tools._workspace_stamp())
+
+    assert asyncio.run(run()) == "cached"
+
+
+@pytest.mark.parametrize("watch", [True, False])
+def test_cache_invalidated_by_other_file(
+    tools: ModuleType, workspace: Path, monkeypatch: pytest.MonkeyPatch, watch: bool
+) -> None:
+    if watch:
+        pytest.importorskip("watchfiles")
+    else:
+        monkeypatch.setattr(tools, "watchfiles", None)
+    queried = _source(tools, workspace, "queried", "a = 1\n")
+    other = _source(tools, workspace, "other", "b = 1\n")
+
+    async def run() -> str | None:
+        key = ("references", "q")
+        relative = str(queried.relative_to(workspace))
+        tools._cache_store(key, tools._workspace_stamp(), "cached", [relative])
+        await asyncio.sleep(0.3)  # Let the watcher start.
+        assert tools._cache_lookup(key, tools._workspace_stamp()) == "cached"
+        other.write_text("b = 1\nc = b\n")
+        for _ in range(50):
+            if tools._cache_lookup(key, tools._workspace_stamp()) is None:
+                return None
+            await asyncio.sleep(0.05)
+        return "cached"
+
+    assert asyncio.run(run()) is None
+
+
+def test_cache_rejects_answers_to_requests_sent_before_an_edit(
+    tools: ModuleType, workspace: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(tools, "watchfiles", None)
+    monkeypatch.setattr(tools, "_STAT_STAMP_TTL_SECONDS", 0.0)
+    queried = _source(tools, workspace, "queried", "a = 1\n")
+    other = _source(tools, workspace, "other", "b = 1\n")
+
+    stamp = tools._workspace_stamp()
+    # Edited while the request is in flight; the answer may predate the edit.
+    other.write_text("b = 1\nc = b\n")
+    tools._cache_store(("hover", "q"), stamp, "stale", [str(queried.relative_to(workspace))])
+
+    assert tools._cache_lookup(("hover", "q"), tools._workspace_stamp()) is None
+
+
+def _apply_change(text: str, change: dict) -> str:
+    """Apply one LSP ranged change, with positions in UTF-16 code units."""
+    lines = text.splitlines(keepends=True)
+
+    def offset(position: dict) -> int:
+        before = "".join(lines[: position["line"]])
+        line = lines[position["line"]] if position["line"] < len(lines) else ""
+        units = line.encode("utf-16-le")[: position["character"] * 2]
+        return len(before) + len(units.decode("utf-16-le"))
+
+    start = offset(change["range"]["start"])
+    end = offset(change["range"]["end"])
+    return text[:start] + change["text"] + text[end:]
+
+
+@pytest.mark.parametrize(
+    ("previous", "text"),
+    [
+        ("a\nb\nc\n", "a\nB\nc\n"),
+        ("a\nb\nc\n", "a\nb\nc\nd\n"),
+        ("a\nb\nc\n", "b\nc\n"),
+        ("a\nb\nc\n", "a\nc\n"),
+        ("a\nb\nc", "a\nb\ncd"),
+        ("a\nb\nc", "a\nb\nc\n"),
+        ("fn x() {}\r\n// 😀 end", "fn x() {}\r\n// 😀 end!\r\n"),
+        ("", "fn main() {}\n"),
+        ("fn main() {}\n", ""),
+        ("x\ny\n", "x\ny\n"),
+    ],
+)
+def test_incremental_change_round_trips(rust_tools: ModuleType, previous: str, text: str) -> None:
+    change = rust_tools._incremental_change(previous, text)
+    assert _apply_change(previous, change) == text
+
+
+def test_incremental_change_covers_only_edited_lines(rust_tools: ModuleType) -> None:
+    previous = "".join(f"line {index}\n" for index in range(1000))
+    text = previous.replace("line 500\n", "line five hundred\n")
+    change = rust_tools._incremental_change(previous, text)
+    assert change == {
+        "range": {"start": {"line": 500, "character": 0}, "end": {"line": 501, "character": 0}},
+        "text": "line five hundred\n",
+    }
+
+
+def test_incremental_change_counts_utf16_units(rust_tools: ModuleType) -> None:
+    change = rust_tools._incremental_change("a\n😀😀", "a\n😀")
+    assert change["range"]["end"] == {"line": 1, "character": 4}
+
+
+def test_diagnostics_belong_to_the_current_open(
+    python_tools: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # ty publishes empty, unversioned diagnostics after each didClose; the next open of
+    # the file must not take them for its own.
+    if shutil.which("ty") is None:
+        pytest.skip("ty is not installed")
+    source = tmp_path / "src" / "module.py"
+    source.parent.mkdir()
+    source.write_text('x: int = "a"\n')
+    monkeypatch.setattr(python_tools, "_REPO_ROOT", tmp_path)
+
+    async def run() -> list[list[dict]]:
+        server = await python_tools._ensure_server()
+        try:
+            results = [await server.wait_for_diagnostics("src/module.py", 5.0) for _ in range(3)]
+            source.write_text("x: int = 1\n")
+            results.append(await server.wait_for_diagnostics("src/module.py", 5.0))
+            return results
+        finally:
+            await python_tools._server_stack.aclose()
+
+    *broken, fixed = asyncio.run(run())
+    assert [len(diagnostics) for diagnostics in broken] == [1, 1, 1]
+    assert fixed == []
+
+
+def test_daemon_files_live_in_a_private_directory(
+    tools: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    socket_path, lock_path, log_path = tools._daemon_paths()
+    directory = tmp_path / "fast-agent-lsp"
+    assert {socket_path.parent, lock_path.parent, log_path.parent} == {directory}
+    assert directory.stat().st_mode & 0o777 == 0o700
+
+
+def test_daemon_refuses_a_shared_directory(
+    tools: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    (tmp_path / "fast-agent-lsp").mkdir(mode=0o777)
+    (tmp_path / "fast-agent-lsp").chmod(0o777)
+    with pytest.raises(RuntimeError, match="mode 700"):
+        tools._daemon_paths()
+
+
+def test_daemon_answers_a_malformed_line_and_keeps_serving(
+    tools: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.setattr(tools, "_DAEMON_IDLE_SECONDS", 0.2)
+
+    async def run() -> list[dict]:
+        daemon = asyncio.create_task(tools._serve_daemon())
+        socket_path = tools._daemon_paths()[0]
+        while not socket_path.exists():
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_unix_connection(str(socket_path))
+        writer.write(b"not json\n")
+        writer.write(b'{"id": 1, "tool": "nope"}\n')
+        await writer.drain()
+        answers = [json.loads(await reader.readline()) for _ in range(2)]
+        writer.close()
+        await daemon
+        return answers
+
+    malformed, unknown = asyncio.run(run())
+    assert malformed["id"] is None and malformed["result"].startswith("Error:")
+    assert unknown == {"id": 1, "result": "Error: Unknown tool 'nope'."}
+
+
+def test_daemon_call_times_out_and_forgets_the_request(
+    tools: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(tools, "_DAEMON_CALL_TIMEOUT_SECONDS", 0.1)
+
+    async def run() -> dict:
+        async def silent(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            await reader.read()
+            writer.close()
+
+        socket_path = str(tmp_path / "silent.sock")
+        async with await asyncio.start_unix_server(silent, path=socket_path):
+            client = tools._DaemonClient(*await asyncio.open_unix_connection(socket_path))
+            with pytest.raises(RuntimeError, match="did not answer"):
+                await client.call("lsp_hover", {})
+            client._writer.close()
+            return client._pending
+
+    assert asyncio.run(run()) == {}
+
+
+def test_daemon_socket_is_per_module(
+    python_tools: ModuleType,
+    typescript_tools: ModuleType,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # Both helpers are called multilspy_tools.py; one repo may use both.
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.setattr(typescript_tools, "_REPO_ROOT", python_tools._REPO_ROOT)
+    assert python_tools._daemon_paths()[0] != typescript_tools._daemon_paths()[0]
+
+
+def test_readiness_waits_for_created_progress(rust_tools: ModuleType) -> None:
+    async def run() -> list[bool]:
+        client = rust_tools.RustAnalyzerClient(Path("."))
+        deadline = client._ready_deadline
+        client._end_grace()
+        states = [client.ready]
+        client._create_progress({"token": "index"})
+        states.append(client.ready)
+        client._progress({"token": "index", "value": {"kind": "begin"}})
+        states.append(client.ready)
+        client._progress({"token": "index", "value": {"kind": "end"}})
+        states.append(client.ready)
+        # Re-indexing clears readiness but keeps the deadline set at start.
+        client._progress({"token": "reindex", "value": {"kind": "begin"}})
+        states.append(client.ready)
+        assert client._ready_deadline == deadline
+        # A created token whose begin never arrives stops holding queries.
+        client._progress({"token": "reindex", "value": {"kind": "end"}})
+        client._create_progress({"token": "never"})
+        states.append(client.ready)
+        await asyncio.sleep(rust_tools._READY_GRACE_SECONDS + 0.1)
+        states.append(client.ready)
+        return states
+
+    assert asyncio.run(run()) == [True, False, False, True, False, False, True]
+
+
+def test_rust_diagnostics_for_an_older_version_are_ignored(rust_tools: ModuleType) -> None:
+    client = rust_tools.RustAnalyzerClient(Path("."))
+    uri = "file:///src/lib.rs"
+    client._versions[uri] = 2
+    current = [{"message": "current"}]
+    client._publish_diagnostics({"uri": uri, "version": 2, "diagnostics": current})
+
+    client._publish_diagnostics({"uri": uri, "version": 1, "diagnostics": [{"message": "old"}]})
+
+    assert client._diagnostics[uri] == current
+
+
+def test_server_without_progress_is_ready_at_start(
+    python_tools: ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    if shutil.which("ty") is None:
+        pytest.skip("ty is not installed")
+    (tmp_path / "src").mkdir()
+    monkeypatch.setattr(python_tools, "_REPO_ROOT", tmp_path)
+
+    async def run() -> bool:
+        server = await python_tools._ensure_server()
+        try:
+            return await server.wait_until_ready(timeout=0.5)
+        finally:
+            await python_tools._stop_server()
+
+    assert asyncio.run(run())
+
+
+def test_uri_to_relative_decodes_percent_escapes(tools: ModuleType, workspace: Path) -> None:
+    path = workspace / "src" / "my module.rs"
+    assert tools._uri_to_relative(path.as_uri()) == "src/my module.rs"
+
+
+def test_replacement_server_is_stopped_when_reopen_fails(
+    rust_tools: ModuleType, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    stopped: list[object] = []
+
+    async def start(self: object) -> None:
+        return None
+
+    async def stop(self: object) -> None:
+        stopped.append(self)
+
+    async def reopen_documents(self: object, previous: object) -> None:
+        raise RuntimeError("rust-analyzer exited")
+
+    client = rust_tools.RustAnalyzerClient
+    monkeypatch.setattr(client, "start", start)
+    monkeypatch.setattr(client, "stop", stop)
+    monkeypatch.setattr(client, "reopen_documents", reopen_documents)
+    monkeypatch.setattr(client, "alive", property(lambda self: False))
+
+    async def run() -> None:
+        rust_tools._server = client(Path("."))
+        with pytest.raises(RuntimeError, match="exited"):
+            await rust_tools._ensure_server()
+
+    asyncio.run(run())
+    # The crashed server and its replacement are both stopped, and neither is kept.
+    assert len(stopped) == 2
+    assert rust_tools._server is None
+
+
+def test_single_flight_shares_one_request(tools: ModuleType) -> None:
+    calls = 0
+
+    async def operation() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return f"answer {calls}"
+
+    async def run() -> list[str]:
+        first = await asyncio.gather(
+            *(tools._single_flight(("hover", "a.py", 1, 1), operation) for _ in range(3))
+        )
+        # Settled requests are forgotten: the next call sends a new one.
+        second = await tools._single_flight(("hover", "a.py", 1, 1), operation)
+        return [*first, second]
+
+    assert asyncio.run(run()) == ["answer 1", "answer 1", "answer 1", "answer 2"]
+    assert tools._request_counts == {"issued": 2, "coalesced": 2}
+    assert tools._inflight == {}
+
+
+def test_single_flight_keeps_request_when_one_caller_is_cancelled(tools: ModuleType) -> None:
+    release = None
+
+    async def operation() -> str:
+        await release.wait()
+        return "answer"
+
+    async def run() -> str:
+        nonlocal release
+        release = asyncio.Event()
+        key = ("references", "a.py", 1, 1)
+        cancelled = asyncio.ensure_future(tools._single_flight(key, operation))
+        kept = asyncio.ensure_future(tools._single_flight(key, operation))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert cancelled.cancelled()
+        return await kept
+
+    assert asyncio.run(run()) == "answer"
+
+
+def test_single_flight_fails_every_caller_and_forgets_the_key(tools: ModuleType) -> None:
+    async def operation() -> str:
+        await asyncio.sleep(0)
+        raise RuntimeError("server exited")
+
+    async def run() -> list[BaseException | str]:
+        key = ("definition", "a.py", 1, 1)
+        return await asyncio.gather(
+            tools._single_flight(key, operation),
+            tools._single_flight(key, operation),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert [str(result) for result in results] == ["server exited", "server exited"]
+    assert tools._inflight == {}
+
+
+class _SymbolServer:
+    """Answers documentSymbol and workspace/symbol for both client flavours."""
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.peak = 0
+        self.requests: list[str] = []
+
+    async def _symbols(self, relative_path: str) -> list[dict]:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.requests.append(relative_path)
+        position = {"line": 0, "character": 0}
+        name = Path(relative_path).stem
+        return [{"name": name, "kind": 12, "selectionRange": {"start": position}}]
+
+    async def supervised(self, operation: object) -> object:
+        return await operation
+
+    async def request_document_symbols(self, relative_path: str) -> tuple[list[dict], None]:
+        return await self._symbols(relative_path), None
+
+    async def document_symbols(self, relative_path: str, *, keep_open: bool = True) -> list[dict]:
+        return await self._symbols(relative_path)
+
+    async def request_workspace_symbol(self, query: str) -> list[dict]:
+        return await self.workspace_symbols(query)
+
+    async def workspace_symbols(self, query: str) -> list[dict]:
+        position = {"line": 0, "character": 0}
+        location = {"uri": "file:///elsewhere/server.rs", "range": {"start": position}}
+        return [{"name": f"{query}_from_server", "kind": 12, "location": location}]
+
+
+@pytest.fixture
+def symbol_server(
+    tools: ModuleType, workspace: Path, monkeypatch: pytest.MonkeyPatch
+) -> _SymbolServer:
+    server = _SymbolServer()
+
+    async def ensure_server() -> _SymbolServer:
+        return server
+
+    monkeypatch.setattr(tools, "_ensure_server", ensure_server)
+    monkeypatch.setattr(tools, "_ready_server", ensure_server)
+    monkeypatch.setattr(tools, "_SYMBOL_INDEX_PATH", workspace / "index.json")
+    return server
+
+
+def test_symbol_index_search_order(tools: ModuleType) -> None:
+    index = tools._SymbolIndex()
+    for name in ("parse_config", "config", "configure", "reconfig", "compile_fn"):
+        index.update(f"src/{name}.py", (1, 1), "hash", [[name, 12, 0, 0]])
+    names = [row[0] for row in index.search("config")]
+    assert names[:2] == ["config", "configure"]  # Exact, then prefix matches.
+    assert set(names[2:]) == {"parse_config", "reconfig"}
+    assert [row[0] for row in index.search("pcfg")] == ["parse_config"]
+
+
+def test_symbol_index_sorts_symbols_without_a_kind(tools: ModuleType) -> None:
+    index = tools._SymbolIndex()
+    index.update("src/a.py", (1, 1), "hash", [["config", None, 3, 0]])
+    index.update("src/b.py", (1, 1), "hash", [["config", 12, 1, 0], ["config", None, 2, 0]])
+
+    assert [(row[2], row[3]) for row in index.search("config")] == [
+        ("src/a.py", 3),
+        ("src/b.py", 1),
+        ("src/b.py", 2),
+    ]
+
+
+def test_symbol_index_refresh_is_bounded_and_incremental(
+    tools: ModuleType, workspace: Path, symbol_server: _SymbolServer
+) -> None:
+    for number in range(20):
+        _source(tools, workspace, f"module_{number}", "x = 1\n")
+    index = tools._SymbolIndex()
+    asyncio.run(tools._refresh_symbol_index(index))
+    assert len(index.files) == 20 and index.complete
+    assert symbol_server.peak <= tools._SYMBOL_INDEX_CONCURRENCY
+
+    # Unchanged files are not asked for again; the saved index keeps the complete flag.
+    symbol_server.requests.clear()
+    reloaded = tools._SymbolIndex.load(workspace / "index.json")
+    asyncio.run(tools._refresh_symbol_index(reloaded))
+    assert symbol_server.requests == []
+    assert reloaded.complete and set(reloaded.files) == set(index.files)
+
+
+def test_partial_symbol_index_defers_to_the_server(
+    tools: ModuleType,
+    workspace: Path,
+    symbol_server: _SymbolServer,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    for number in range(6):
+        (workspace / "src" / f"package_{number}").mkdir()
+        _source(tools, workspace, f"package_{number}/handler_{number}", "x = 1\n")
+    index = tools._SymbolIndex()
+    asyncio.run(tools._refresh_symbol_index(index))
+    assert index.complete and len(index.files) == 6
+
+    # A scan cut off by the limit marks the index partial and keeps files it did not reach.
+    monkeypatch.setattr(tools, "_WARMUP_SCAN_LIMIT", 3)
+    monkeypatch.setattr(tools, "_symbol_index", index)
+    asyncio.run(tools._refresh_symbol_index(index))
+    assert not index.complete and len(index.files) == 6
+
+    monkeypatch.setattr(tools, "_SYMBOL_INDEX_REFRESH_SECONDS", 3600.0)
+    answer = asyncio.run(tools.lsp_workspace_symbols("handler"))
+    assert "handler_from_server" in answer
+
+    index.complete = True
+    answer = asyncio.run(tools.lsp_workspace_symbols("handler"))
+    assert "handler_from_server" not in answer and "handler_0" in answer